@@ -0,0 +1,37 @@
+"""last_question
+
+Revision ID: 3d8c1f5a6e20
+Revises: 9b3f6d2e8a57
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8c1f5a6e20'
+down_revision = '9b3f6d2e8a57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('games', sa.Column('last_question_id', sa.Integer(), nullable=True))
+    # last id of the history is the question of the current round
+    op.execute(
+        "UPDATE games SET last_question_id = "
+        "(regexp_split_to_array(trim(q_history), '\\s+'))"
+        "[array_length(regexp_split_to_array(trim(q_history), '\\s+'), 1)]::integer "
+        "WHERE trim(q_history) <> ''"
+    )
+    op.drop_column('games', 'q_history')
+
+
+def downgrade() -> None:
+    op.add_column('games', sa.Column('q_history', sa.String(), server_default='', nullable=False))
+    op.execute(
+        "UPDATE games SET q_history = last_question_id::text "
+        "WHERE last_question_id IS NOT NULL"
+    )
+    op.drop_column('games', 'last_question_id')
@@ -1,6 +1,6 @@
 import typing as t
 
-from src.app.admin.views import AdminCurrentView, AdminLoginView
+from src.app.admin.views import AdminCurrentView, AdminLoginView, AdminStatsView
 
 if t.TYPE_CHECKING:
     from src.app.web.app import Application
@@ -9,3 +9,4 @@ if t.TYPE_CHECKING:
 def setup_routes(app: "Application"):
     app.router.add_view("/admin.login", AdminLoginView)
     app.router.add_view("/admin.current", AdminCurrentView)
+    app.router.add_view("/admin.stats", AdminStatsView)
@@ -5,3 +5,11 @@ class AdminSchema(Schema):
     id = fields.Int(required=False)
     email = fields.Str(required=True)
     password = fields.Str(required=True, load_only=True)
+
+
+class StatsSchema(Schema):
+    database = fields.Dict()
+    update_filter = fields.Dict()
+    player_cache = fields.Dict()
+    dispatcher = fields.Dict()
+    sender = fields.Dict()
@@ -4,7 +4,7 @@ from aiohttp.web_exceptions import HTTPForbidden
 from aiohttp_apispec import request_schema, response_schema
 from aiohttp_session import new_session
 
-from src.app.admin.schemes import AdminSchema
+from src.app.admin.schemes import AdminSchema, StatsSchema
 from src.app.web.app import View
 from src.app.web.mixins import AuthRequiredMixin
 from src.app.web.utils import json_response
@@ -35,3 +35,19 @@ class AdminCurrentView(AuthRequiredMixin, View):
     @response_schema(AdminSchema)
     async def get(self):
         return json_response(data=AdminSchema().dump(self.request.admin))
+
+
+class AdminStatsView(AuthRequiredMixin, View):
+    @response_schema(StatsSchema)
+    async def get(self):
+        return json_response(
+            data=StatsSchema().dump(
+                {
+                    "database": self.database.get_pool_stats(),
+                    "update_filter": self.store.bot_manager.update_filter.get_stats(),
+                    "player_cache": self.store.players.get_stats(),
+                    "dispatcher": self.store.tg_api.dispatcher.get_stats(),
+                    "sender": self.store.tg_api.sender.get_stats(),
+                }
+            )
+        )
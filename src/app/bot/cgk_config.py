@@ -41,3 +41,12 @@ class CGKState:
     CAPITAN: str = "capitan"
     ANSWER: str = "answer"
     WAIT: str = "wait"
+
+
+@dataclass
+class CGKEvent:
+    DISCUSSION_WARNING: str = "discussion_warning"
+    DISCUSSION_END: str = "discussion_end"
+    CAPITAN_TIMEOUT: str = "capitan_timeout"
+    ANSWER_TIMEOUT: str = "answer_timeout"
+    NEXT_QUESTION: str = "next_question"
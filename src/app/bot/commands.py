@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+# route key for a handler valid in every game state
+ANY_STATE = None
+# route key for messages no command route matched
+TEXT = None
+
+
+@dataclass(frozen=True)
+class Route:
+    state: Optional[str]
+    command: Optional[str]
+    handler: Callable
+    # run BotManager.finish_round after the handler
+    finish_round: bool = True
+
+
+class CommandRouter:
+    """
+    Registry of message handlers keyed by (game state, command).
+    A message is routed to the first match of:
+    (state, command), (ANY_STATE, command), (state, TEXT).
+    In exclusive states only routes of that state are looked up
+    """
+
+    def __init__(self):
+        self.routes: dict[tuple[Optional[str], Optional[str]], Route] = {}
+        self.exclusive_states: set[str] = set()
+
+    def route(
+            self,
+            commands: str | Iterable[Optional[str]] | None,
+            states: Iterable[Optional[str]] = (ANY_STATE,),
+            finish_round: bool = True,
+    ) -> Callable:
+        """
+        Register decorated handler
+        :param commands: Command or commands without `/`, TEXT for other messages
+        :param states: Game states the handler is valid in
+        :param finish_round: Run finish_round after the handler
+        :return: Decorator
+        """
+        if commands is TEXT or isinstance(commands, str):
+            commands = (commands,)
+
+        def decorator(handler: Callable) -> Callable:
+            for state in states:
+                for command in commands:
+                    if (state, command) in self.routes:
+                        raise ValueError(f"route {state}/{command} is already registered")
+                    self.routes[(state, command)] = Route(state, command, handler, finish_round)
+            return handler
+
+        return decorator
+
+    def exclusive(self, state: str) -> None:
+        self.exclusive_states.add(state)
+
+    def resolve(self, state: str, command: Optional[str]) -> Optional[Route]:
+        """
+        Find route for a message
+        :param state: Game status
+        :param command: Parsed command, None for plain text
+        :return: Route or None
+        """
+        routes = self.routes
+        route = routes.get((state, command)) if command is not None else None
+        if route is None and state not in self.exclusive_states:
+            if command is not None:
+                route = routes.get((ANY_STATE, command))
+            if route is None:
+                route = routes.get((state, TEXT))
+        return route
+
+    def describe(self) -> list[dict]:
+        """
+        Registered routes, for inspection
+        """
+        return [
+            {
+                "state": route.state,
+                "command": route.command,
+                "handler": route.handler.__name__,
+                "finish_round": route.finish_round,
+            }
+            for route in self.routes.values()
+        ]
@@ -1,10 +1,14 @@
-import asyncio
 import typing as t
+from typing import Optional
 
 from sqlalchemy.exc import IntegrityError
 
-from src.app.bot.cgk_config import CGKConfig, CGKState
-from src.app.bot.models import GameModel, PlayerModel
+from src.app.bot.cgk_config import CGKConfig, CGKEvent, CGKState
+from src.app.bot.commands import ANY_STATE, TEXT, CommandRouter
+from src.app.bot.models import GameModel
+from src.app.bot.roster import Roster
+from src.app.bot.update_filter import UpdateFilter
+from src.app.store.scheduler.scheduler import Deadline
 from src.app.store.tg_api.dataclasses import Message, Update, CallbackQuery
 
 if t.TYPE_CHECKING:
@@ -12,135 +16,227 @@ if t.TYPE_CHECKING:
 
 cgk_config = CGKConfig()
 cgk_state = CGKState()
+cgk_event = CGKEvent()
+
+# game status an event is valid for
+EVENT_STATES = {
+    cgk_event.DISCUSSION_WARNING: cgk_state.DISCUSSION,
+    cgk_event.DISCUSSION_END: cgk_state.DISCUSSION,
+    cgk_event.CAPITAN_TIMEOUT: cgk_state.CAPITAN,
+    cgk_event.ANSWER_TIMEOUT: cgk_state.ANSWER,
+    cgk_event.NEXT_QUESTION: cgk_state.WAIT,
+}
+# event that resumes a game found in progress without a saved deadline
+RECOVERY_EVENTS = {
+    cgk_state.DISCUSSION: cgk_event.DISCUSSION_END,
+    cgk_state.CAPITAN: cgk_event.CAPITAN_TIMEOUT,
+    cgk_state.ANSWER: cgk_event.ANSWER_TIMEOUT,
+    cgk_state.WAIT: cgk_event.NEXT_QUESTION,
+}
+# message handlers of BotManager, see CommandRouter
+router = CommandRouter()
+# only /end_game is handled during discussion
+router.exclusive(cgk_state.DISCUSSION)
 
 
 class BotManager:
     def __init__(self, app: "Application"):
         self.app = app
+        self.update_filter = UpdateFilter(app)
+        # rosters of started games by chat id
+        self.rosters: dict[int, Roster] = {}
 
     async def handle_update(self, update: Update) -> None:
-        if update.message:
-            await self.handle_message(update.message)
-        elif update.callback_query:
-            await self.handle_callback_query(update.callback_query)
+        # chatter is dropped without touching database
+        if not self.update_filter.check(update):
+            return
+        async with self.app.database.unit_of_work():
+            if update.message:
+                await self.handle_message(update.message)
+            elif update.callback_query:
+                await self.handle_callback_query(update.callback_query)
 
     async def handle_message(self, message: Message) -> None:
-        # Get a Game object if game in database, else create new Game and add to database
-        game = await self.app.store.tg_api.get_game_by_message(message)
-        if game is None:
-            game = await self.app.store.tg_api.create_game_by_message(message)
-
-        # skip messages if in discussion
-        if (
-            game.status == cgk_state.DISCUSSION
-            and self.extract_command(message) != "end_game"
-        ):
+        # Get a Game object from cache or database, else create new Game and add to database
+        game = await self.app.store.games.get_or_create(message)
+
+        route = router.resolve(game.status, self.get_command(message))
+        if route is None:
+            # skip messages if in discussion
+            if game.status in router.exclusive_states:
+                return
+        else:
+            await route.handler(self, game, message)
+            if not route.finish_round:
+                return
+        await self.finish_round(game)
+
+    def get_command(self, message: Message) -> Optional[str]:
+        """
+        Command of the message, commands addressed to other bots are
+        treated as plain text
+        :param message: Message object
+        :return: Command without `/` or None
+        """
+        username = self.app.config.bot.username
+        if message.command_to and username and message.command_to.lower() != username.lower():
+            return None
+        return message.command
+
+    # handle menu commands
+    @router.route(tuple(cgk_config.menu), finish_round=False)
+    async def send_menu(self, game: GameModel, message: Message) -> None:
+        await self.app.store.tg_api.send_message(
+            game.id, cgk_config.menu[message.command], critical=False
+        )
+
+    @router.route("group_stats")
+    async def send_group_stats(self, game: GameModel, message: Message) -> None:
+        statistic = game.statistic(self.app.store.stats.game_pending(game.id))
+        await self.app.store.tg_api.send_message(game.id, statistic, critical=False)
+
+    @router.route("player_stats")
+    async def send_player_stats(self, game: GameModel, message: Message) -> None:
+        player = await self.app.store.tg_api.get_player_by_id(message.user.id)
+        if player:
+            statistic = player.statistic(self.app.store.stats.player_pending(player.id))
+            await self.app.store.tg_api.send_message(game.id, statistic, critical=False)
+
+    # Send join team inline buttons
+    @router.route("team_up", states=[cgk_state.OFF])
+    async def team_up(self, game: GameModel, message: Message) -> None:
+        game.status = cgk_state.TEAM_UP
+        await self.app.store.tg_api.send_inline_button(message, "join")
+
+    # start_game, start sending questions
+    @router.route("start_game", states=[cgk_state.TEAM_UP])
+    async def start_game(self, game: GameModel, message: Message) -> None:
+        if game.team_size == 0:
+            return
+        game.shuffle_team()
+        self.rosters.pop(game.id, None)
+        roster = await self.get_roster(game)
+        # declare a capitan to the group
+        await self.app.store.tg_api.send_message(
+            game.id, f"{roster.capitan_name} is the capitan!"
+        )
+        game.status = cgk_state.WAIT
+
+    # end_game, clear game
+    @router.route("end_game", states=[ANY_STATE, cgk_state.DISCUSSION])
+    async def end_game(self, game: GameModel, message: Message) -> None:
+        self.app.store.stats.count_game(game.id, "canceled")
+        await self.app.store.tg_api.remove_buttons(
+            game, f"Game ended by {message.user.first_name}"
+        )
+        self.clear_game(game)
+
+    # CAPITAN choose the responder, late choice is handled by CAPITAN_TIMEOUT
+    @router.route(TEXT, states=[cgk_state.CAPITAN])
+    async def choose_responder(self, game: GameModel, message: Message) -> None:
+        if message.user.id != game.cap_id:
             return
-        # handle menu commands
-        elif self.extract_command(message) in cgk_config.menu:
+        roster = await self.get_roster(game)
+        responder_id = roster.by_name.get(message.text)
+        if responder_id is not None:
+            game.responder_id = responder_id
+            game.status = cgk_state.ANSWER
+            # before sending, so a failed send can't leave the game without deadline
+            self.set_deadline(
+                game, cgk_event.ANSWER_TIMEOUT, cgk_config.TIME_LIMIT_ANSWER
+            )
+            update_time = await self.app.store.tg_api.remove_buttons(
+                game,
+                f"{message.text}, send your answer in {cgk_config.TIME_LIMIT_ANSWER} sec!",
+            )
+            game.update_time = update_time
+
+    # RESPONDER is answering, late answer is handled by ANSWER_TIMEOUT
+    @router.route(TEXT, states=[cgk_state.ANSWER])
+    async def check_answer(self, game: GameModel, message: Message) -> None:
+        if message.user.id != game.responder_id:
+            return
+        self.cancel_deadline(game)
+        last_question = await self.app.store.quiz.get_question_by_id(
+            game.last_question_id
+        )
+        if last_question.check_answer(message.text):
+            game.score_team += 1
+            game.status = cgk_state.WAIT
+            self.app.store.stats.count_player(game.responder_id, "ans_correct")
             await self.app.store.tg_api.send_message(
-                game.id, cgk_config.menu[self.extract_command(message)]
+                game.id, f"Correct!!!\n{game.score}"
             )
+        else:
+            game.score_host += 1
+            game.status = cgk_state.WAIT
+            self.app.store.stats.count_player(game.responder_id, "ans_wrong")
+            await self.app.store.tg_api.send_message(
+                game.id,
+                f"Wrong!!! Correct answer: {last_question.answer}\n{game.score}",
+            )
+
+    async def handle_deadline(self, deadline: Deadline) -> None:
+        """
+        Handle game event fired by scheduler
+        :param deadline: Deadline object
+        :return:
+        """
+        async with self.app.database.unit_of_work():
+            await self._handle_deadline(deadline)
+
+    async def _handle_deadline(self, deadline: Deadline) -> None:
+        game = await self.app.store.games.get(deadline.game_id)
+        # skip events outdated by messages handled before
+        if game is None or game.status != EVENT_STATES[deadline.event]:
             return
-        elif self.extract_command(message) == "group_stats":
-            await self.app.store.tg_api.send_message(game.id, game.statistic)
-        elif self.extract_command(message) == "player_stats":
-            player = await self.app.store.tg_api.get_player_by_id(message.user.id)
-            if player:
-                await self.app.store.tg_api.send_message(game.id, player.statistic)
-
-        # Handle commands
-        # Send join team inline buttons
-        elif (
-            game.status == cgk_state.OFF and self.extract_command(message) == "team_up"
-        ):
-            game.status = cgk_state.TEAM_UP
-            await self.app.store.tg_api.send_inline_button(message, "join")
-
-        # start_game, start sending questions
-        elif (
-            game.status == cgk_state.TEAM_UP
-            and self.extract_command(message) == "start_game"
-            and game.team_size > 0
-        ):
-            game.shuffle_team()
-            # declare a capitan to the group
-            capitan = await self.app.store.tg_api.get_player_by_id(game.cap_id)
+
+        if deadline.event == cgk_event.DISCUSSION_WARNING:
+            self.set_deadline(
+                game, cgk_event.DISCUSSION_END, cgk_config.TIME_LIMIT_DISC_EXTRA
+            )
             await self.app.store.tg_api.send_message(
-                game.id, f"{capitan.first_name} is the capitan!"
+                game.id, f"{cgk_config.TIME_LIMIT_DISC_EXTRA} seconds remaining"
             )
-            await asyncio.sleep(1)
-            await self.send_question(game)
 
-        # end_game, clear game
-        elif self.extract_command(message) == "end_game":
-            game.canceled += 1
+        elif deadline.event == cgk_event.DISCUSSION_END:
+            game.status = cgk_state.CAPITAN
+            self.set_deadline(
+                game, cgk_event.CAPITAN_TIMEOUT, cgk_config.TIME_LIMIT_CAPITAN
+            )
+            update_time = await self.app.store.tg_api.send_choose_responder_buttons(
+                game,
+                await self.get_roster(game),
+                f"Cap, who will answer?\n{cgk_config.TIME_LIMIT_CAPITAN} sec to choose",
+            )
+            game.update_time = update_time
+
+        elif deadline.event == cgk_event.CAPITAN_TIMEOUT:
+            game.deadline = game.deadline_event = None
+            game.score_host += 1
+            game.status = cgk_state.WAIT
             await self.app.store.tg_api.remove_buttons(
-                game, f"Game ended by {message.user.first_name}"
+                game, f"Player select is late! Round lost\n{game.score}"
             )
-            game.clear_game()
-
-        # CAPITAN choose the responder
-        elif game.status == cgk_state.CAPITAN:
-            time_spent = message.date - game.update_time
-            if time_spent > cgk_config.TIME_LIMIT_CAPITAN:
-                game.score_host += 1
-                await self.app.store.tg_api.remove_buttons(
-                    game, f"Player select is late! Round lost\n{game.score}"
-                )
-                game.status = cgk_state.WAIT
-            elif (
-                time_spent <= cgk_config.TIME_LIMIT_CAPITAN
-                and message.user.id == game.cap_id
-            ):
-                responder = await self.app.store.tg_api.get_player_by_name(
-                    game, message.text
-                )
-                if responder:
-                    game.responder_id = responder.id
-                    game.status = cgk_state.ANSWER
-                    update_time = await self.app.store.tg_api.remove_buttons(
-                        game,
-                        f"{responder.first_name}, send your answer in {cgk_config.TIME_LIMIT_ANSWER} sec!",
-                    )
-                    game.update_time = update_time
-
-        # RESPONDER is answering
-        elif game.status == cgk_state.ANSWER:
-            time_spent = message.date - game.update_time
-            responder = await self.app.store.tg_api.get_player_by_id(message.user.id)
-            if time_spent > cgk_config.TIME_LIMIT_ANSWER:
-                game.score_host += 1
-                game.status = cgk_state.WAIT
-                responder.ans_late += 1
-                await self.app.store.tg_api.send_message(
-                    game.id, f"Answer is late! Round lost\n{game.score}"
-                )
 
-            elif (
-                time_spent <= cgk_config.TIME_LIMIT_ANSWER
-                and message.user.id == game.responder_id
-            ):
-                last_question = await self.app.store.quiz.get_question_by_id(
-                    game.last_question_id
-                )
-                if last_question.check_answer(message.text):
-                    game.score_team += 1
-                    game.status = cgk_state.WAIT
-                    responder.ans_correct += 1
-                    await self.app.store.tg_api.send_message(
-                        game.id, f"Correct!!!\n{game.score}"
-                    )
-                else:
-                    game.score_host += 1
-                    game.status = cgk_state.WAIT
-                    responder.ans_wrong += 1
-                    await self.app.store.tg_api.send_message(
-                        game.id,
-                        f"Wrong!!! Correct answer: {last_question.answer}\n{game.score}",
-                    )
-            # update db with player object after answering
-            await self.update_player_db(responder)
+        elif deadline.event == cgk_event.ANSWER_TIMEOUT:
+            game.deadline = game.deadline_event = None
+            game.score_host += 1
+            game.status = cgk_state.WAIT
+            if game.responder_id is not None:
+                self.app.store.stats.count_player(game.responder_id, "ans_late")
+            await self.app.store.tg_api.send_message(
+                game.id, f"Answer is late! Round lost\n{game.score}"
+            )
+
+        await self.finish_round(game)
+
+    async def finish_round(self, game: GameModel) -> None:
+        """
+        Save game after update or event and send next question if needed
+        :param game: GameModel object
+        :return:
+        """
         # check if game finished
         await self.check_game_finished(game)
         # update db with game object
@@ -152,37 +248,32 @@ class BotManager:
 
     async def send_question(self, game: GameModel) -> None:
         """
-        Send question
+        Send question and schedule the end of discussion
         :param game: GameModel object
         :return:
         """
-        game.status = cgk_state.DISCUSSION
         question = await self.app.store.quiz.get_question_for_game(game)
-        game.add_question_to_history(question.id)
+        if question is None:
+            await self.app.store.tg_api.send_message(game.id, "No questions to ask :(")
+            self.clear_game(game)
+            await self.update_game_db(game)
+            return
+        game.status = cgk_state.DISCUSSION
+        game.last_question_id = question.id
+        self.set_deadline(
+            game, cgk_event.DISCUSSION_WARNING, cgk_config.TIME_LIMIT_DISC_MAIN
+        )
         await self.update_game_db(game)
 
         await self.app.store.tg_api.send_message(
             game.id,
             f"{question.title}\nYou have {cgk_config.TIME_LIMIT_DISC_MAIN + cgk_config.TIME_LIMIT_DISC_EXTRA} sec",
         )
-        await asyncio.sleep(cgk_config.TIME_LIMIT_DISC_MAIN)
-        await self.app.store.tg_api.send_message(
-            game.id, f"{cgk_config.TIME_LIMIT_DISC_EXTRA} seconds remaining"
-        )
-        await asyncio.sleep(cgk_config.TIME_LIMIT_DISC_EXTRA)
-        game.status = cgk_state.CAPITAN
-        update_time = await self.app.store.tg_api.send_choose_responder_buttons(
-            game,
-            f"Cap, who will answer?\n{cgk_config.TIME_LIMIT_CAPITAN} sec to choose",
-        )
-        game.update_time = update_time
-
-        await self.update_game_db(game)
 
     async def handle_callback_query(self, cq: CallbackQuery):
-        game = await self.app.store.tg_api.get_game_by_message(cq.message)
+        game = await self.app.store.games.get(cq.message.chat.id)
 
-        if not (game.status == cgk_state.TEAM_UP and cq.data == "join"):
+        if game is None or not (game.status == cgk_state.TEAM_UP and cq.data == "join"):
             # handle random cq requests
             await self.app.store.tg_api.answer_cq(cq, "")
             return
@@ -218,30 +309,76 @@ class BotManager:
         if 6 not in (game.score_team, game.score_host):
             return
         if game.score_host == 6:
-            game.loses += 1
+            self.app.store.stats.count_game(game.id, "loses")
             await self.app.store.tg_api.send_message(
                 game.id, f"Host won.\n{game.score}"
             )
         elif game.score_team == 6:
-            game.wins += 1
+            self.app.store.stats.count_game(game.id, "wins")
             await self.app.store.tg_api.send_message(
                 game.id, f"Team won. Congrats!\n{game.score}"
             )
+        self.clear_game(game)
+
+    def clear_game(self, game: GameModel) -> None:
+        """
+        Reset game and drop its pending deadline
+        :param game: Game object
+        :return:
+        """
+        self.cancel_deadline(game)
+        self.rosters.pop(game.id, None)
         game.clear_game()
 
-    async def update_game_db(self, game: GameModel):
-        async with self.app.database.session.begin() as session:
-            session.add(game)
+    async def get_roster(self, game: GameModel) -> Roster:
+        """
+        Get roster of started game, team players are loaded once per game
+        or after restart
+        :param game: Game object
+        :return: Roster object
+        """
+        roster = self.rosters.get(game.id)
+        if roster is None:
+            players = await self.app.store.tg_api.get_team_players_models(game)
+            roster = self.rosters[game.id] = Roster.build(game, players)
+        return roster
 
-    async def update_player_db(self, player: PlayerModel):
-        async with self.app.database.session.begin() as session:
-            session.add(player)
+    def set_deadline(self, game: GameModel, event: str, delay: float) -> None:
+        """
+        Schedule game event and keep it in game, so it survives restart
+        :param game: Game object
+        :param event: CGKEvent name
+        :param delay: Seconds from now
+        :return:
+        """
+        deadline = self.app.store.scheduler.schedule(game.id, event, delay)
+        game.deadline = deadline.at
+        game.deadline_event = event
+        # saved even if the handler fails after this
+        self.app.store.games.mark_dirty(game)
+
+    def cancel_deadline(self, game: GameModel) -> None:
+        self.app.store.scheduler.cancel(game.id)
+        game.deadline = game.deadline_event = None
 
-    @staticmethod
-    def extract_command(message: Message) -> str:
+    async def restore_games(self) -> None:
         """
-        Extract possible command from Message text
-        :param message: Message object
-        :return: Possible `/` command
+        Reschedule deadlines of games, that were in progress at shutdown.
+        Overdue deadlines are fired right away
+        :return:
         """
-        return message.text.split("@")[0][1:]
+        for game in await self.app.store.tg_api.get_active_games():
+            self.app.store.games.put(game)
+            if game.deadline_event:
+                self.app.store.scheduler.schedule_at(
+                    game.id, game.deadline_event, game.deadline
+                )
+            elif game.status in RECOVERY_EVENTS:
+                # game saved without a deadline, resume its round now
+                self.app.store.scheduler.schedule(
+                    game.id, RECOVERY_EVENTS[game.status], 0
+                )
+
+    async def update_game_db(self, game: GameModel):
+        # written behind in batches by game cache
+        self.app.store.games.mark_dirty(game)
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
 from random import sample
+from typing import Mapping, Optional
 
-from sqlalchemy import Integer, Column, String, BigInteger
+from sqlalchemy import Integer, Column, String, BigInteger, Float
 
 from src.app.store.database.sqlalchemy_base import Base
 
@@ -13,7 +14,7 @@ class Game:
     score_host: int = 0
     score_team: int = 0
     team: str = ""
-    q_history: str = ""
+    last_question_id: int = None
     update_time: int = None
 
 
@@ -24,33 +25,19 @@ class GameModel(Base):
     score_host = Column(Integer, default=0, nullable=False)
     score_team = Column(Integer, default=0, nullable=False)
     team = Column(String, default="", nullable=False)
-    q_history = Column(String, default="", nullable=False)
+    # question of the current round, questions asked before are tracked
+    # by the question cycle cursor
+    last_question_id = Column(Integer, nullable=True)
     update_time = Column(Integer, nullable=True)
     responder_id = Column(Integer, nullable=True)
     wins = Column(Integer, default=0, nullable=False)
     loses = Column(Integer, default=0, nullable=False)
     canceled = Column(Integer, default=0, nullable=False)
-
-    def q_history_to_list(self):
-        return [item for item in self.q_history.split()]
-
-    def list_to_q_history(self, lst: list):
-        self.q_history = " ".join(lst)
-
-    def add_question_to_history(self, question_id):
-        lst = self.q_history_to_list()
-        lst.append(str(question_id))
-        self.list_to_q_history(lst)
-
-    def check_question_in_history(self, question_id):
-        return str(question_id) in self.q_history_to_list()
-
-    def clear_history(self):
-        self.q_history = ""
-
-    @property
-    def last_question_id(self):
-        return self.q_history_to_list()[-1] if self.q_history else None
+    deadline = Column(Float, nullable=True)
+    deadline_event = Column(String, nullable=True)
+    q_seed = Column(Integer, default=0, nullable=False)
+    q_cursor = Column(Integer, default=0, nullable=False)
+    q_cycle_size = Column(Integer, default=0, nullable=False)
 
     def team_to_list(self):
         return [item for item in self.team.split()]
@@ -85,15 +72,24 @@ class GameModel(Base):
         self.status = "off"
         self.team = ""
         self.responder_id = None
+        self.deadline = self.deadline_event = None
         self.score_team = self.score_host = 0
 
     @property
     def score(self):
         return f"TEAM: {self.score_team}\nHOST: {self.score_host}"
 
-    @property
-    def statistic(self):
-        return f"Group stats:\nWins: {self.wins}\nLoses: {self.loses}\nCanceled: {self.canceled}"
+    def statistic(self, pending: Optional[Mapping[str, int]] = None) -> str:
+        """
+        :param pending: Counter deltas not written to database yet
+        :return: Group stats message
+        """
+        pending = pending or {}
+        return (
+            f"Group stats:\nWins: {self.wins + pending.get('wins', 0)}\n"
+            f"Loses: {self.loses + pending.get('loses', 0)}\n"
+            f"Canceled: {self.canceled + pending.get('canceled', 0)}"
+        )
 
     def __repr__(self):
         return (
@@ -102,9 +98,10 @@ class GameModel(Base):
             f"score_host: {self.score_host}\n"
             f"score_team: {self.score_team}\n"
             f"team: {self.team}\n"
-            f"q_history: {self.q_history}\n"
+            f"last_question_id: {self.last_question_id}\n"
             f"responder_id: {self.responder_id}\n"
-            f"update_time: {self.update_time})\n"
+            f"update_time: {self.update_time}\n"
+            f"deadline: {self.deadline_event} at {self.deadline})\n"
         )
 
 
@@ -117,12 +114,16 @@ class PlayerModel(Base):
     ans_wrong = Column(Integer, nullable=False, default=0)
     ans_late = Column(Integer, nullable=False, default=0)
 
-    @property
-    def statistic(self):
+    def statistic(self, pending: Optional[Mapping[str, int]] = None) -> str:
+        """
+        :param pending: Counter deltas not written to database yet
+        :return: Personal stats message
+        """
+        pending = pending or {}
         return (
-            f"Personal stats:\nCorrect answers: {self.ans_correct}\n"
-            f"Wrong answers: {self.ans_wrong}\n"
-            f"Late answers: {self.ans_late}"
+            f"Personal stats:\nCorrect answers: {self.ans_correct + pending.get('ans_correct', 0)}\n"
+            f"Wrong answers: {self.ans_wrong + pending.get('ans_wrong', 0)}\n"
+            f"Late answers: {self.ans_late + pending.get('ans_late', 0)}"
         )
 
     def __repr__(self):
@@ -131,3 +132,13 @@ class PlayerModel(Base):
             f"username: {self.username}\n"
             f"first_name: {self.first_name}\n"
         )
+
+
+class UpdateOffsetModel(Base):
+    __tablename__ = "update_offsets"
+    # bot id, from bot token
+    id = Column(BigInteger, primary_key=True)
+    update_id = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} (id: {self.id}, update_id: {self.update_id})"
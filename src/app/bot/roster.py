@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+from src.app.bot.models import GameModel, PlayerModel
+
+
+@dataclass(slots=True, frozen=True)
+class Roster:
+    """
+    Team of a started game with reply keyboard and capitan mention built
+    once. Team doesn't change after start_game, so the roster is reused
+    every round until the game is cleared
+    """
+    # (player id, first name) in team order, capitan first
+    players: tuple[tuple[int, str], ...]
+    # first name to player id, for the button capitan pressed
+    by_name: dict[str, int]
+    # reply_markup of responder choice message
+    keyboard: dict
+    # entities mentioning capitan at the start of a message
+    capitan_mention: list[dict]
+
+    @classmethod
+    def build(cls, game: GameModel, players: Iterable[PlayerModel]) -> "Roster":
+        """
+        :param game: Started game
+        :param players: Team players in any order
+        :return: Roster object
+        """
+        by_id = {player.id: player for player in players}
+        team = tuple(
+            (by_id[player_id].id, f"{by_id[player_id].first_name}")
+            for player_id in map(int, game.team_to_list())
+            if player_id in by_id
+        )
+        by_name = {}
+        for player_id, name in team:
+            by_name.setdefault(name, player_id)
+        capitan_id, capitan_name = team[0] if team else (None, "")
+        return cls(
+            players=team,
+            by_name=by_name,
+            keyboard={
+                "keyboard": [[{"text": name} for _, name in team]],
+                "resize_keyboard": True,
+                "one_time_keyboard": True,
+                "selective": True,
+            },
+            capitan_mention=[{
+                "type": "text_mention",
+                "offset": 0,
+                "length": len(capitan_name),
+                "user": {"id": capitan_id},
+            }],
+        )
+
+    @property
+    def capitan_name(self) -> str:
+        return self.players[0][1] if self.players else ""
@@ -0,0 +1,12 @@
+import typing as t
+
+from src.app.bot.views import WebhookView
+from src.app.web.config import BotMode
+
+if t.TYPE_CHECKING:
+    from src.app.web.app import Application
+
+
+def setup_routes(app: "Application"):
+    if app.config.bot.mode == BotMode.WEBHOOK:
+        app.router.add_view("/bot.webhook", WebhookView)
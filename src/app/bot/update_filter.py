@@ -0,0 +1,80 @@
+import typing as t
+from collections import Counter
+from typing import Optional
+
+from src.app.bot.cgk_config import CGKState
+from src.app.store.tg_api.dataclasses import Update
+
+if t.TYPE_CHECKING:
+    from src.app.web.app import Application
+
+cgk_state = CGKState()
+
+
+class DropReason:
+    DISCUSSION = "discussion"
+    NOT_COMMAND = "not_command"
+    NOT_CAPITAN = "not_capitan"
+    NOT_RESPONDER = "not_responder"
+
+
+# statuses where plain text can't change the game
+TEXT_IGNORED = (cgk_state.OFF, cgk_state.TEAM_UP)
+
+
+class UpdateFilter:
+    """
+    Drops messages that can't change game state before any database
+    access. Status of the chat game is read from the game cache, chats
+    without a cached game are always passed to the handler
+    """
+
+    def __init__(self, app: "Application"):
+        self.app = app
+        self.dropped: Counter[str] = Counter()
+        self.passed = 0
+
+    def drop_reason(self, update: Update) -> Optional[str]:
+        """
+        Decide if update is worth handling
+        :param update: Update object
+        :return: Reason to drop the update, None to handle it
+        """
+        message = update.message
+        if message is None:
+            return None
+        game = self.app.store.games.peek(message.chat.id)
+        if game is None:
+            return None
+
+        command = self.app.store.bot_manager.get_command(message)
+        status = game.status
+        if status == cgk_state.DISCUSSION:
+            # only /end_game is handled during discussion
+            if command != "end_game":
+                return DropReason.DISCUSSION
+        elif command is not None:
+            return None
+        elif status in TEXT_IGNORED:
+            return DropReason.NOT_COMMAND
+        elif status == cgk_state.CAPITAN and message.user.id != game.cap_id:
+            return DropReason.NOT_CAPITAN
+        elif status == cgk_state.ANSWER and message.user.id != game.responder_id:
+            return DropReason.NOT_RESPONDER
+        return None
+
+    def check(self, update: Update) -> bool:
+        """
+        Count update as passed or dropped
+        :param update: Update object
+        :return: True if update should be handled
+        """
+        reason = self.drop_reason(update)
+        if reason is None:
+            self.passed += 1
+            return True
+        self.dropped[reason] += 1
+        return False
+
+    def get_stats(self) -> dict:
+        return {"passed": self.passed, "dropped": dict(self.dropped)}
@@ -0,0 +1,32 @@
+import hmac
+import json
+
+from aiohttp.web_exceptions import HTTPBadRequest, HTTPUnauthorized
+
+from src.app.store.tg_api.decoding import loads
+from src.app.web.app import View
+from src.app.web.utils import json_response
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookView(View):
+    async def post(self):
+        secret = self.request.app.config.bot.webhook_secret
+        # bytes, compare_digest rejects non-ASCII str
+        received = self.request.headers.get(SECRET_TOKEN_HEADER, "").encode(
+            "utf-8", "surrogateescape"
+        )
+        # nothing is accepted until a secret is configured
+        if not secret or not hmac.compare_digest(received, secret.encode()):
+            raise HTTPUnauthorized(reason="invalid secret token")
+
+        try:
+            raw_update = await self.request.json(loads=loads)
+        except json.JSONDecodeError:
+            raise HTTPBadRequest(reason="update is not a valid json")
+        if not isinstance(raw_update, dict) or "update_id" not in raw_update:
+            raise HTTPBadRequest(reason="update_id is missing")
+
+        await self.store.tg_api.handle_raw_update(raw_update)
+        return json_response()
@@ -2,6 +2,7 @@ import typing
 
 from src.app.quiz.views import (
     QuestionAddView,
+    QuestionImportView,
     QuestionListView,
 )
 
@@ -13,3 +14,4 @@ if typing.TYPE_CHECKING:
 def setup_routes(app: "Application"):
     app.router.add_view("/quiz.add_question", QuestionAddView)
     app.router.add_view("/quiz.list_questions", QuestionListView)
+    app.router.add_view("/quiz.import_questions", QuestionImportView)
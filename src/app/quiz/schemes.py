@@ -1,4 +1,4 @@
-from marshmallow import fields, Schema
+from marshmallow import fields, Schema, validate
 
 
 class QuestionSchema(Schema):
@@ -9,3 +9,22 @@ class QuestionSchema(Schema):
 
 class ListQuestionSchema(Schema):
     questions = fields.Nested(QuestionSchema, many=True)
+    next_after_id = fields.Int(allow_none=True)
+
+
+class ListQuestionQuerySchema(Schema):
+    after_id = fields.Int(required=False)
+    limit = fields.Int(required=False, validate=validate.Range(min=1, max=1000))
+    format = fields.Str(required=False, validate=validate.OneOf(["json", "ndjson"]))
+
+
+class ImportErrorSchema(Schema):
+    line = fields.Int()
+    message = fields.Raw()
+
+
+class ImportQuestionsSchema(Schema):
+    inserted = fields.Int()
+    skipped = fields.Int()
+    errors = fields.Int()
+    error_lines = fields.Nested(ImportErrorSchema, many=True)
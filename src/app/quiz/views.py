@@ -1,10 +1,28 @@
-from aiohttp_apispec import request_schema, response_schema
+import csv
+import json
+from collections import deque
+from typing import AsyncIterator, Optional
 
-from src.app.quiz.schemes import QuestionSchema, ListQuestionSchema
+from aiohttp import StreamReader
+
+from aiohttp.web_exceptions import HTTPBadRequest
+from aiohttp.web_response import StreamResponse
+from aiohttp_apispec import docs, querystring_schema, request_schema, response_schema
+from marshmallow import EXCLUDE, ValidationError
+
+from src.app.quiz.schemes import (
+    ImportQuestionsSchema,
+    ListQuestionQuerySchema,
+    ListQuestionSchema,
+    QuestionSchema,
+)
 from src.app.web.app import View
 from src.app.web.mixins import AuthRequiredMixin
 from src.app.web.utils import json_response
 
+# questions serialized per write of a streamed response
+STREAM_CHUNK_SIZE = 100
+
 
 class QuestionAddView(AuthRequiredMixin, View):
     @request_schema(QuestionSchema)
@@ -17,9 +35,244 @@ class QuestionAddView(AuthRequiredMixin, View):
 
 
 class QuestionListView(AuthRequiredMixin, View):
+    @querystring_schema(ListQuestionQuerySchema)
     @response_schema(ListQuestionSchema)
     async def get(self):
-        questions = await self.request.app.store.quiz.list_questions()
+        after_id = self.querystring.get("after_id")
+        limit = self.querystring.get("limit")
+        if self.querystring.get("format") == "ndjson":
+            return await self._stream_ndjson(after_id, limit)
+        if limit is None:
+            return await self._stream_json(after_id)
+
+        questions = await self.store.quiz.list_questions(after_id, limit)
+        next_after_id = questions[-1].id if len(questions) == limit else None
         return json_response(
-            data={"questions": QuestionSchema().dump(questions, many=True)}
+            data={
+                "questions": QuestionSchema().dump(questions, many=True),
+                "next_after_id": next_after_id,
+            }
         )
+
+    async def _stream_json(self, after_id: int | None) -> StreamResponse:
+        # same body as json_response, written in chunks from db cursor
+        response = StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(self.request)
+        await response.write(b'{"status": "ok", "data": {"questions": [')
+        separator = ""
+        async for chunk in self._dumped_chunks(after_id):
+            await response.write((separator + ", ".join(chunk)).encode())
+            separator = ", "
+        await response.write(b"]}}")
+        await response.write_eof()
+        return response
+
+    async def _stream_ndjson(self, after_id: int | None, limit: int | None) -> StreamResponse:
+        response = StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(self.request)
+        async for chunk in self._dumped_chunks(after_id, limit):
+            await response.write(("\n".join(chunk) + "\n").encode())
+        await response.write_eof()
+        return response
+
+    async def _dumped_chunks(self, after_id: int | None, limit: int | None = None):
+        schema = QuestionSchema()
+        chunk = []
+        async for question in self.store.quiz.stream_questions(after_id, limit):
+            chunk.append(json.dumps(schema.dump(question)))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+IMPORT_BATCH_SIZE = 1000
+# error details returned in response, the rest are only counted
+MAX_ERROR_LINES = 100
+# longer lines are skipped and reported as errors
+MAX_LINE_SIZE = 64 * 1024
+
+
+async def read_lines(content: StreamReader) -> AsyncIterator[tuple[int, Optional[bytes]]]:
+    """
+    Split request body into lines as it arrives
+    :param content: Request body stream
+    :return: Line number and line without newline, None for lines longer
+    than MAX_LINE_SIZE
+    """
+    line_no = 0
+    tail = b""
+    # rest of too long line is dropped until next newline
+    skipping = False
+    async for chunk in content.iter_any():
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            line_no += 1
+            if skipping or len(line) > MAX_LINE_SIZE:
+                skipping = False
+                yield line_no, None
+            else:
+                yield line_no, line
+        if len(tail) > MAX_LINE_SIZE:
+            tail = b""
+            skipping = True
+    if skipping or tail:
+        yield line_no + 1, None if skipping else tail
+
+
+def ends_in_quoted_field(line: str, quoted: bool) -> bool:
+    """
+    Check if a quoted field is open at the end of CSV line. Quotes inside
+    unquoted fields are plain characters, like csv module treats them
+    :param line: CSV line
+    :param quoted: True if the line continues a quoted field
+    :return: True if the record goes on on the next line
+    """
+    if not quoted and '"' not in line:
+        return False
+    field_start = not quoted
+    escaped = False
+    for char in line:
+        if escaped:
+            # second quote of "" may as well close the field
+            escaped = False
+            quoted = char == '"'
+        elif quoted:
+            escaped = char == '"'
+            quoted = not escaped
+        elif char == '"' and field_start:
+            quoted = True
+        field_start = char == "," and not quoted
+    return quoted
+
+
+class CsvFeed:
+    """
+    Lines for csv.reader, filled from the async body stream. Remembers
+    where the record read last started
+    """
+
+    def __init__(self):
+        self.lines: deque[tuple[int, str]] = deque()
+        self.record_line: Optional[int] = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        line_no, line = self.lines.popleft()
+        if self.record_line is None:
+            self.record_line = line_no
+        return line
+
+
+class QuestionImportView(AuthRequiredMixin, View):
+    @docs(
+        summary="Import questions from CSV (with title,answer header) or JSONL body",
+        parameters=[{"in": "query", "name": "format", "schema": {"type": "string", "enum": ["csv", "jsonl"]}}],
+    )
+    @response_schema(ImportQuestionsSchema)
+    async def post(self):
+        import_format = self.request.query.get("format")
+        if import_format is None:
+            import_format = "csv" if self.request.content_type == "text/csv" else "jsonl"
+        if import_format not in ("csv", "jsonl"):
+            raise HTTPBadRequest(reason="format must be csv or jsonl")
+
+        schema = QuestionSchema(unknown=EXCLUDE)
+        report = {"inserted": 0, "skipped": 0, "errors": 0, "error_lines": []}
+        batch = []
+        # body is read line by line, so memory use does not depend on its size
+        rows = self._csv_rows() if import_format == "csv" else self._jsonl_rows()
+        async for line_no, row in rows:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                question = schema.load(row)
+                batch.append({"title": question["title"], "answer": question["answer"]})
+            except (ValueError, csv.Error, ValidationError) as e:
+                report["errors"] += 1
+                if len(report["error_lines"]) < MAX_ERROR_LINES:
+                    message = e.messages if isinstance(e, ValidationError) else str(e)
+                    report["error_lines"].append({"line": line_no, "message": message})
+                continue
+
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await self._insert_batch(batch, report)
+                batch = []
+        if batch:
+            await self._insert_batch(batch, report)
+
+        return json_response(data=ImportQuestionsSchema().dump(report))
+
+    async def _jsonl_rows(self) -> AsyncIterator[tuple[int, dict | Exception]]:
+        async for line_no, line in read_lines(self.request.content):
+            try:
+                if line is None:
+                    raise ValueError(f"Line is longer than {MAX_LINE_SIZE} bytes")
+                text = line.decode("utf-8")
+                if not text.strip():
+                    continue
+                yield line_no, json.loads(text)
+            except ValueError as e:
+                yield line_no, e
+
+    async def _csv_rows(self) -> AsyncIterator[tuple[int, dict | Exception]]:
+        """
+        One csv.reader over the whole body, so quoted fields may span lines.
+        Lines are handed to it once no quoted field is left open
+        """
+        feed = CsvFeed()
+        reader = csv.reader(feed, strict=True)
+        header = None
+        # lines of a record with open quoted field
+        record: list[tuple[int, str]] = []
+        record_size = 0
+        quoted = False
+        async for line_no, line in read_lines(self.request.content):
+            try:
+                if line is None:
+                    record, record_size, quoted = [], 0, False
+                    raise ValueError(f"Line is longer than {MAX_LINE_SIZE} bytes")
+                text = line.decode("utf-8")
+            except ValueError as e:
+                yield line_no, e
+                continue
+            record.append((line_no, text + "\n"))
+            record_size += len(line)
+            quoted = ends_in_quoted_field(text, quoted)
+            if quoted:
+                if record_size <= MAX_LINE_SIZE:
+                    continue
+                start = record[0][0]
+                record, record_size, quoted = [], 0, False
+                yield start, ValueError(f"Record is longer than {MAX_LINE_SIZE} bytes")
+                continue
+            feed.lines.extend(record)
+            record, record_size = [], 0
+            while feed.lines:
+                feed.record_line = None
+                try:
+                    values = next(reader)
+                except csv.Error as e:
+                    feed.lines.clear()
+                    yield feed.record_line, e
+                    break
+                # blank line
+                if not values:
+                    continue
+                if header is None:
+                    header = values
+                    continue
+                yield feed.record_line, dict(zip(header, values))
+        if record:
+            yield record[0][0], ValueError("Quoted field is not closed")
+
+    async def _insert_batch(self, batch: list[dict], report: dict) -> None:
+        inserted = await self.store.quiz.import_questions(batch)
+        report["inserted"] += inserted
+        report["skipped"] += len(batch) - inserted
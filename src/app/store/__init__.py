@@ -11,16 +11,27 @@ class Store:
         from src.app.store.admin.accessor import AdminAccessor
         from src.app.store.quiz.accessor import QuizAccessor
         from src.app.bot.manager import BotManager
+        from src.app.store.cache.game_cache import GameCache
+        from src.app.store.cache.player_cache import PlayerCache
+        from src.app.store.cache.stats_counter import StatsCounter
+        from src.app.store.scheduler.scheduler import DeadlineScheduler
         from src.app.store.tg_api.accessor import TgApiAccessor
 
         self.admins = AdminAccessor(app)
         self.bot_manager = BotManager(app)
         self.quiz = QuizAccessor(app)
+        self.scheduler = DeadlineScheduler(app)
         self.tg_api = TgApiAccessor(app)
+        # after tg_api, so dirty games are flushed once updates are stopped
+        self.games = GameCache(app)
+        self.players = PlayerCache(app)
+        # after tg_api too, drained once no handler can count
+        self.stats = StatsCounter(app)
 
 
 def setup_store(app: "Application"):
     app.database = Database(app)
     app.on_startup.append(app.database.connect)
-    app.on_cleanup.append(app.database.disconnect)
     app.store = Store(app)
+    # accessors may still write on cleanup
+    app.on_cleanup.append(app.database.disconnect)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+import typing as t
+from typing import Optional
+
+from sqlalchemy import bindparam, update
+
+from src.app.bot.cgk_config import CGKState
+from src.app.bot.models import GameModel
+from src.app.store.base.base_accessor import BaseAccessor
+from src.app.store.cache.stats_counter import GAME_COUNTERS
+from src.app.store.tg_api.dataclasses import Message
+
+if t.TYPE_CHECKING:
+    from src.app.web.app import Application
+
+logger = logging.getLogger(__name__)
+
+cgk_state = CGKState()
+
+# stats counters are incremented in database by StatsCounter
+GAME_COLUMNS = [
+    column.key for column in GameModel.__table__.columns
+    if column.key != "id" and column.key not in GAME_COUNTERS
+]
+# plain executemany, a game created in a not yet committed transaction
+# just matches no row
+UPDATE_GAME = (
+    update(GameModel.__table__)
+    .where(GameModel.__table__.c.id == bindparam("game_id"))
+)
+
+
+class GameCache(BaseAccessor):
+    """
+    Authoritative in-process state of games, keyed by chat id.
+    Changed games are marked dirty and written to database in batches
+    every `game_flush_interval` seconds and on shutdown. Only one process
+    may serve a bot: TgApiAccessor takes a database advisory lock on start.
+    """
+
+    def __init__(self, app: "Application", *args, **kwargs):
+        super().__init__(app, *args, **kwargs)
+        self.is_running = False
+        self.flush_task: Optional[asyncio.Task] = None
+        self._games: dict[int, GameModel] = {}
+        self._touched: dict[int, float] = {}
+        self._dirty: set[int] = set()
+
+    async def connect(self, app: "Application"):
+        self.is_running = True
+        self.flush_task = asyncio.create_task(self.run())
+
+    async def disconnect(self, app: "Application"):
+        self.is_running = False
+        if self.flush_task:
+            self.flush_task.cancel()
+            await asyncio.gather(self.flush_task, return_exceptions=True)
+            self.flush_task = None
+        await self.flush()
+        self._games.clear()
+        self._touched.clear()
+
+    async def get(self, game_id: int) -> Optional[GameModel]:
+        """
+        Get game from cache, load it from db on miss
+        :param game_id: Chat ID
+        :return: GameModel object
+        """
+        game = self._games.get(game_id)
+        if game is None:
+            while True:
+                generation = self.app.store.stats.generation
+                game = await self.app.store.tg_api.get_game_by_id(game_id)
+                if game is None:
+                    return None
+                # counters read during a stats flush miss its catch up, reload
+                if self.app.store.stats.is_stable(generation):
+                    break
+            # a concurrent load may have put it while we were waiting
+            game = self._games.setdefault(game_id, game)
+        self._touched[game_id] = time.monotonic()
+        return game
+
+    def peek(self, game_id: int) -> Optional[GameModel]:
+        """
+        Get game if it is cached, without loading it
+        :param game_id: Chat ID
+        :return: GameModel object or None
+        """
+        return self._games.get(game_id)
+
+    async def get_or_create(self, message: Message) -> GameModel:
+        """
+        Get game of message chat, create it if chat has no game yet
+        :param message: Message object
+        :return: GameModel object
+        """
+        game = await self.get(message.chat.id)
+        if game is None:
+            game = await self.app.store.tg_api.create_game_by_message(message)
+            self.put(game)
+        return game
+
+    def put(self, game: GameModel) -> None:
+        self._games[game.id] = game
+        self._touched[game.id] = time.monotonic()
+
+    def mark_dirty(self, game: GameModel) -> None:
+        """
+        Schedule game write to database
+        :param game: GameModel object
+        :return:
+        """
+        self.put(game)
+        self._dirty.add(game.id)
+
+    async def flush(self) -> None:
+        """
+        Write all dirty games with one executemany UPDATE
+        :return:
+        """
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        # snapshot before awaiting, handlers may change games meanwhile
+        rows = [
+            {
+                "game_id": game_id,
+                **{column: getattr(self._games[game_id], column) for column in GAME_COLUMNS},
+            }
+            for game_id in dirty
+        ]
+        try:
+            async with self.app.database.session.begin() as session:
+                await session.execute(UPDATE_GAME, rows)
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+    async def run(self):
+        while self.is_running:
+            await asyncio.sleep(self.app.config.cache.game_flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush %s games", len(self._dirty))
+            self.evict_idle()
+
+    def evict_idle(self) -> None:
+        """
+        Drop clean games, that are off and were not used for a while
+        :return:
+        """
+        expired = time.monotonic() - self.app.config.cache.game_idle_ttl
+        for game_id, touched in list(self._touched.items()):
+            if (
+                    touched < expired
+                    and game_id not in self._dirty
+                    and self._games[game_id].status == cgk_state.OFF
+            ):
+                del self._games[game_id]
+                del self._touched[game_id]
+
+    def __len__(self):
+        return len(self._games)
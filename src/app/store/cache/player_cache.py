@@ -0,0 +1,77 @@
+import time
+import typing as t
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.app.bot.models import PlayerModel
+
+if t.TYPE_CHECKING:
+    from src.app.web.app import Application
+
+PLAYER_COLUMNS = [column.key for column in PlayerModel.__table__.columns]
+
+
+class PlayerCache:
+    """
+    LRU cache of player rows with TTL. Column values are kept, not ORM
+    objects, and every hit builds a new detached PlayerModel, so callers
+    in different sessions never share an instance. Entries are dropped
+    when players are written, TTL bounds staleness of anything missed.
+    Every invalidation bumps `version`, so a row read before it is not
+    cached after it
+    """
+
+    def __init__(self, app: "Application"):
+        self.app = app
+        self._players: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+
+    def get(self, player_id: int) -> Optional[PlayerModel]:
+        """
+        Get cached player
+        :param player_id: ID of the player
+        :return: Detached PlayerModel, None on miss
+        """
+        entry = self._players.get(player_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._players[player_id]
+            self.misses += 1
+            return None
+        self._players.move_to_end(player_id)
+        self.hits += 1
+        player = PlayerModel(**entry[1])
+        # persistent identity, so session.add updates the row
+        make_transient_to_detached(player)
+        return player
+
+    def put(self, player: PlayerModel, version: Optional[int] = None) -> None:
+        """
+        Cache snapshot of player columns
+        :param player: PlayerModel object loaded from database
+        :param version: `version` taken before the player was loaded, snapshot
+        is dropped if an invalidation happened since
+        :return:
+        """
+        if version is not None and version != self.version:
+            return
+        values = {column: getattr(player, column) for column in PLAYER_COLUMNS}
+        expires = time.monotonic() + self.app.config.cache.player_ttl
+        self._players[player.id] = (expires, values)
+        self._players.move_to_end(player.id)
+        if len(self._players) > self.app.config.cache.player_cache_size:
+            self._players.popitem(last=False)
+
+    def invalidate(self, player_id: int) -> None:
+        self.version += 1
+        self._players.pop(player_id, None)
+
+    def get_stats(self) -> dict:
+        return {"size": len(self._players), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._players)
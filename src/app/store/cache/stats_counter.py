@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import typing as t
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import ARRAY, Integer, Table, bindparam, cast, func, select, update
+
+from src.app.bot.models import GameModel, PlayerModel
+from src.app.store.base.base_accessor import BaseAccessor
+
+if t.TYPE_CHECKING:
+    from src.app.web.app import Application
+
+logger = logging.getLogger(__name__)
+
+GAME_COUNTERS = ("wins", "loses", "canceled")
+PLAYER_COUNTERS = ("ans_correct", "ans_wrong", "ans_late")
+
+
+def increment_statement(table: Table, counters: tuple[str, ...]):
+    """
+    UPDATE table SET col = col + deltas.col FROM unnest(ids, deltas...).
+    Rows are passed as parallel arrays: `ids` and `d_<counter>` params
+    """
+    deltas = select(
+        func.unnest(cast(bindparam("ids"), ARRAY(table.c.id.type))).label("id"),
+        *(
+            func.unnest(cast(bindparam(f"d_{counter}"), ARRAY(Integer))).label(counter)
+            for counter in counters
+        ),
+    ).subquery("deltas")
+    return (
+        update(table)
+        .where(table.c.id == deltas.c.id)
+        .values({counter: table.c[counter] + deltas.c[counter] for counter in counters})
+    )
+
+
+INCREMENT_GAMES = increment_statement(GameModel.__table__, GAME_COUNTERS)
+INCREMENT_PLAYERS = increment_statement(PlayerModel.__table__, PLAYER_COUNTERS)
+
+
+def increment_params(deltas: dict[int, Counter], counters: tuple[str, ...]) -> dict:
+    ids = list(deltas)
+    return {
+        "ids": ids,
+        **{f"d_{counter}": [deltas[row_id][counter] for row_id in ids] for counter in counters},
+    }
+
+
+class StatsCounter(BaseAccessor):
+    """
+    Game and player stats counters. Increments are collected in memory and
+    written every `stats_flush_interval` seconds and on shutdown as one
+    `col = col + delta` UPDATE per table, so concurrent handlers never
+    overwrite each other's counts. Counters are not changed on models:
+    displayed stats are database values plus deltas not written yet.
+    `generation` is odd while a flush is being written and changes with
+    every flush, so readers can tell if counters they loaded may predate it
+    """
+
+    def __init__(self, app: "Application", *args, **kwargs):
+        super().__init__(app, *args, **kwargs)
+        self.is_running = False
+        self.flush_task: Optional[asyncio.Task] = None
+        self._games: dict[int, Counter] = {}
+        self._players: dict[int, Counter] = {}
+        # deltas being written, still pending for display
+        self._flushing: tuple[dict[int, Counter], dict[int, Counter]] = ({}, {})
+        self.generation = 0
+
+    async def connect(self, app: "Application"):
+        self.is_running = True
+        self.flush_task = asyncio.create_task(self.run())
+
+    async def disconnect(self, app: "Application"):
+        self.is_running = False
+        if self.flush_task:
+            self.flush_task.cancel()
+            await asyncio.gather(self.flush_task, return_exceptions=True)
+            self.flush_task = None
+        await self.flush()
+
+    def count_game(self, game_id: int, counter: str) -> None:
+        """
+        :param game_id: Chat ID
+        :param counter: One of GAME_COUNTERS
+        :return:
+        """
+        self._games.setdefault(game_id, Counter())[counter] += 1
+
+    def count_player(self, player_id: int, counter: str) -> None:
+        """
+        :param player_id: ID of the player
+        :param counter: One of PLAYER_COUNTERS
+        :return:
+        """
+        self._players.setdefault(player_id, Counter())[counter] += 1
+
+    def game_pending(self, game_id: int) -> Counter:
+        """
+        Deltas of game counters not written to database yet
+        """
+        return self._flushing[0].get(game_id, Counter()) + self._games.get(game_id, Counter())
+
+    def player_pending(self, player_id: int) -> Counter:
+        """
+        Deltas of player counters not written to database yet
+        """
+        return self._flushing[1].get(player_id, Counter()) + self._players.get(player_id, Counter())
+
+    async def flush(self) -> None:
+        """
+        Write collected deltas, one UPDATE per table
+        :return:
+        """
+        if not (self._games or self._players):
+            return
+        games, self._games = self._games, {}
+        players, self._players = self._players, {}
+        self._flushing = (games, players)
+        self.generation += 1
+        try:
+            async with self.app.database.session.begin() as session:
+                if games:
+                    await session.execute(INCREMENT_GAMES, increment_params(games, GAME_COUNTERS))
+                if players:
+                    await session.execute(
+                        INCREMENT_PLAYERS, increment_params(players, PLAYER_COUNTERS)
+                    )
+        except Exception:
+            for pending, failed in ((self._games, games), (self._players, players)):
+                for row_id, deltas in failed.items():
+                    pending.setdefault(row_id, Counter()).update(deltas)
+            raise
+        finally:
+            self._flushing = ({}, {})
+            self.generation += 1
+
+        # cached rows catch up with database
+        for game_id, deltas in games.items():
+            game = self.app.store.games.peek(game_id)
+            if game is not None:
+                for counter, delta in deltas.items():
+                    setattr(game, counter, getattr(game, counter) + delta)
+        for player_id in players:
+            self.app.store.players.invalidate(player_id)
+
+    def is_stable(self, generation: int) -> bool:
+        """
+        Check that no flush ran since `generation` was taken
+        :param generation: `generation` taken before loading counters
+        :return: True if loaded counters can't predate a flush
+        """
+        return generation % 2 == 0 and generation == self.generation
+
+    async def run(self):
+        while self.is_running:
+            await asyncio.sleep(self.app.config.cache.stats_flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception(
+                    "Failed to flush stats of %s games, %s players",
+                    len(self._games), len(self._players),
+                )
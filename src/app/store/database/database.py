@@ -1,14 +1,24 @@
+import asyncio
 import typing as t
-from typing import Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
 
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from src.app.store.database import Base
+from src.app.store.database.pool import TimedQueuePool
 
 if t.TYPE_CHECKING:
     from src.app.web.app import Application
 
+# session of the unit of work running in current task, if any
+current_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+    "current_session", default=None
+)
+
 
 class Database:
     def __init__(self, app: "Application"):
@@ -16,20 +26,122 @@ class Database:
         self._engine: Optional[AsyncEngine] = None
         self._db: Optional[declarative_base] = None
         self.session: Optional[AsyncSession] = None
+        self._instance_lock: Optional[AsyncConnection] = None
 
     async def connect(self, *_: list, **__: dict) -> None:
         self._db = Base
+        config = self.app.config.database
         self._engine = create_async_engine(
-            url=self.app.config.database.get_db_url(),
+            url=config.get_db_url(),
             echo=False,
             future=True,
+            poolclass=TimedQueuePool,
+            pool_size=config.pool_size,
+            max_overflow=config.max_overflow,
+            pool_timeout=config.pool_timeout,
+            pool_pre_ping=config.pool_pre_ping,
+            pool_recycle=config.pool_recycle,
+            connect_args={
+                "statement_cache_size": config.statement_cache_size,
+                "prepared_statement_cache_size": config.prepared_statement_cache_size,
+            },
         )
         # noinspection PyTypeChecker
         self.session = sessionmaker(
             self._engine, expire_on_commit=False, class_=AsyncSession
         )
+        if config.pool_warmup:
+            await self.warm_up()
 
     async def disconnect(self, *_: list, **__: dict) -> None:
+        if self._instance_lock is not None:
+            await self._instance_lock.close()
+            self._instance_lock = None
         if self._engine is not None:
             await self._engine.dispose()
             self._engine = None
+
+    async def warm_up(self) -> None:
+        """
+        Open pool_size connections at once, so first updates don't wait
+        for connection setup
+        :return:
+        """
+        connections = await asyncio.gather(
+            *(self._engine.connect() for _ in range(self.app.config.database.pool_size))
+        )
+        for connection in connections:
+            await connection.close()
+
+    async def lock_instance(self, key: int) -> None:
+        """
+        Take session level advisory lock `key` and hold its connection until
+        disconnect. Game state lives in process memory, so a second process
+        serving the same bot must not start
+        :param key: Lock key, e.g. bot id
+        :return:
+        """
+        connection = await self._engine.connect()
+        locked = await connection.scalar(select(func.pg_try_advisory_lock(key)))
+        # don't keep the connection idle in transaction
+        await connection.commit()
+        if not locked:
+            await connection.close()
+            raise RuntimeError(f"Another process already serves bot {key}")
+        self._instance_lock = connection
+
+    def get_pool_stats(self) -> dict:
+        """
+        Live connection pool stats, wait times are in seconds
+        :return: Dict with pool stats
+        """
+        if self._engine is None:
+            return {}
+        return self._engine.pool.get_stats()
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncIterator[AsyncSession]:
+        """
+        Session for accessor calls. Joins the current unit of work, so its
+        transaction is committed once at the end. Without unit of work
+        opens and commits own transaction
+        :return: AsyncSession
+        """
+        session = current_session.get()
+        if session is not None:
+            yield session
+            return
+        async with self.session.begin() as session:
+            yield session
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[AsyncSession]:
+        """
+        Share one session between all accessor calls made inside, e.g. while
+        handling one update. Work is committed at the end, or earlier by
+        `release`, and rolled back on error
+        :return: AsyncSession
+        """
+        session = current_session.get()
+        if session is not None:
+            yield session
+            return
+        async with self.session() as session:
+            token = current_session.set(session)
+            try:
+                yield session
+                await session.commit()
+            finally:
+                current_session.reset(token)
+
+    async def release(self) -> None:
+        """
+        Commit work of the current unit of work and return its connection
+        to the pool. Called before slow outbound calls, e.g. Bot API requests,
+        so rate limit waits and retries don't hold a connection. Statements
+        after it run in a new transaction
+        :return:
+        """
+        session = current_session.get()
+        if session is not None and session.in_transaction():
+            await session.commit()
@@ -0,0 +1,70 @@
+import time
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue
+
+
+class TimedQueue(AsyncAdaptedQueue):
+    """
+    Pool queue that measures how long checkouts block waiting for
+    a connection to be returned
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def get(self, block: bool = True, timeout=None):
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            wait = time.perf_counter() - started
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that measures how long checkouts wait for a connection,
+    and separately how long opening new connections takes
+    """
+
+    _queue_class = TimedQueue
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.connects = 0
+        self.connect_total = 0.0
+        self.connect_max = 0.0
+
+    def _do_get(self):
+        self.checkouts += 1
+        return super()._do_get()
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            connect = time.perf_counter() - started
+            self.connects += 1
+            self.connect_total += connect
+            self.connect_max = max(self.connect_max, connect)
+
+    def get_stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "wait_total": self._pool.wait_total,
+            "wait_avg": self._pool.wait_total / self.checkouts if self.checkouts else 0.0,
+            "wait_max": self._pool.wait_max,
+            "connects": self.connects,
+            "connect_avg": self.connect_total / self.connects if self.connects else 0.0,
+            "connect_max": self.connect_max,
+        }
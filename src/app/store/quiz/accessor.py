@@ -1,23 +1,61 @@
+import typing as t
+from array import array
+from typing import AsyncIterator, Optional
+
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 
 from src.app.bot.models import GameModel
 from src.app.store.base.base_accessor import BaseAccessor
 from src.app.quiz.models import QuestionModel, Question
+from src.app.store.quiz.sampler import new_seed, permute
+
+if t.TYPE_CHECKING:
+    from src.app.web.app import Application
 
 
 class QuizAccessor(BaseAccessor):
+    def __init__(self, app: "Application", *args, **kwargs):
+        super().__init__(app, *args, **kwargs)
+        self._question_ids: Optional[array] = None
+
+    async def disconnect(self, app: "Application"):
+        self._question_ids = None
+
     async def create_question(self, title: str, answer: str) -> Question:
-        async with self.app.database.session.begin() as session:
+        async with self.app.database.begin() as session:
             question = QuestionModel(
                 title=title,
                 answer=answer,
             )
             session.add(question)
-            return Question(id=question.id, title=title, answer=answer)
+            # flush to get question id
+            await session.flush()
+        self.add_question_ids([question.id])
+        return Question(id=question.id, title=title, answer=answer)
+
+    async def import_questions(self, questions: list[dict]) -> int:
+        """
+        Insert batch of questions with one statement, skipping titles
+        that already exist
+        :param questions: List of dicts with title and answer
+        :return: Number of inserted questions
+        """
+        stmt = (
+            insert(QuestionModel)
+            .values(questions)
+            .on_conflict_do_nothing(index_elements=[QuestionModel.title])
+            .returning(QuestionModel.id)
+        )
+        async with self.app.database.begin() as session:
+            result = await session.scalars(stmt)
+            ids = sorted(result.all())
+        self.add_question_ids(ids)
+        return len(ids)
 
     async def get_question_by_title(self, title: str) -> Question | None:
         stmt = select(QuestionModel).where(QuestionModel.title == title)
-        async with self.app.database.session.begin() as session:
+        async with self.app.database.begin() as session:
             result = await session.execute(stmt)
             data = result.scalars().all()
             if data:
@@ -26,38 +64,99 @@ class QuizAccessor(BaseAccessor):
 
     async def get_question_by_id(self, id: int) -> QuestionModel | None:
         stmt = select(QuestionModel).where(QuestionModel.id == int(id))
-        async with self.app.database.session.begin() as session:
+        async with self.app.database.begin() as session:
             result = await session.scalars(stmt)
             return result.one_or_none()
 
-    async def list_questions(self) -> list[Question]:
-        stmt = select(QuestionModel)
+    async def list_questions(
+            self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> list[Question]:
+        """
+        Get page of questions ordered by id
+        :param after_id: Return questions with greater id only
+        :param limit: Page size, all questions if None
+        :return: List of Question objects
+        """
+        stmt = self._list_questions_stmt(after_id).limit(limit)
 
-        async with self.app.database.session.begin() as session:
+        async with self.app.database.begin() as session:
             result = await session.execute(stmt)
-            questions = result.scalars().all()
-            return [
-                Question(
-                    q.id,
-                    q.title,
-                    q.answer,
-                )
-                for q in questions
-            ]
-
-    async def get_question_for_game(self, game: GameModel):
+            return [Question(*row) for row in result]
+
+    async def stream_questions(
+            self,
+            after_id: Optional[int] = None,
+            limit: Optional[int] = None,
+            chunk_size: int = 1000,
+    ) -> AsyncIterator[Question]:
+        """
+        Iterate over questions ordered by id, reading them from server side
+        cursor in chunks, so memory use does not depend on number of questions
+        :param after_id: Return questions with greater id only
+        :param limit: Number of questions, all questions if None
+        :param chunk_size: Rows fetched from cursor at once
+        :return: Async iterator of Question objects
+        """
         stmt = (
-            select(QuestionModel)
-            .where(QuestionModel.id.notin_(list(map(int, game.q_history_to_list()))))
-            .limit(1)
+            self._list_questions_stmt(after_id)
+            .limit(limit)
+            .execution_options(yield_per=chunk_size)
         )
-        async with self.app.database.session.begin() as session:
-            result = await session.scalars(stmt)
-            question = result.one_or_none()
-            if question is None:
-                game.clear_history()
-                return await self.get_question_for_game(game)
-            return question
 
+        async with self.app.database.begin() as session:
+            result = await session.stream(stmt)
+            async for row in result:
+                yield Question(*row)
+
+    @staticmethod
+    def _list_questions_stmt(after_id: Optional[int]):
+        stmt = (
+            select(QuestionModel.id, QuestionModel.title, QuestionModel.answer)
+            .order_by(QuestionModel.id)
+        )
+        if after_id is not None:
+            stmt = stmt.where(QuestionModel.id > after_id)
+        return stmt
+
+    async def get_question_ids(self) -> array:
+        """
+        Sorted ids of all questions, loaded once and kept in memory
+        :return: Array of question ids
+        """
+        if self._question_ids is None:
+            stmt = select(QuestionModel.id).order_by(QuestionModel.id)
+            async with self.app.database.begin() as session:
+                result = await session.scalars(stmt)
+                self._question_ids = array("q", result.all())
+        return self._question_ids
 
+    def add_question_ids(self, ids: list[int]) -> None:
+        # new questions get greater ids, so array stays sorted
+        if self._question_ids is not None:
+            self._question_ids.extend(ids)
 
+    async def get_question_for_game(self, game: GameModel) -> QuestionModel | None:
+        """
+        Draw random question, not yet asked in current cycle of the game.
+        Game walks a pseudo-random permutation of question bank, stored as
+        seed and cursor, so every draw is O(1). Questions added during the
+        cycle join the next one
+        :param game: GameModel object
+        :return: QuestionModel or None if there are no questions
+        """
+        ids = await self.get_question_ids()
+        if not ids:
+            return None
+        while True:
+            if not game.q_cycle_size or game.q_cursor >= game.q_cycle_size:
+                # all questions asked, start new cycle
+                game.q_seed = new_seed()
+                game.q_cursor = 0
+                game.q_cycle_size = len(ids)
+            index = permute(game.q_cursor, game.q_cycle_size, game.q_seed)
+            game.q_cursor += 1
+            if index >= len(ids):
+                continue
+            question = await self.get_question_by_id(ids[index])
+            if question is not None:
+                return question
@@ -0,0 +1,39 @@
+import random
+
+MASK_64 = (1 << 64) - 1
+ROUNDS = 4
+
+
+def _round(value: int, seed: int, round_no: int) -> int:
+    # splitmix64 finalizer over value, seed and round number
+    h = (value * 0x9E3779B97F4A7C15 + seed * 0xBF58476D1CE4E5B9 + round_no) & MASK_64
+    h ^= h >> 31
+    h = (h * 0x94D049BB133111EB) & MASK_64
+    return h ^ (h >> 29)
+
+
+def permute(index: int, size: int, seed: int) -> int:
+    """
+    Position of `index` in a pseudo-random permutation of range(size),
+    chosen by `seed`. Uses a Feistel network with cycle walking, so every
+    call is O(1) and no permutation is stored
+    :param index: Index in range(size)
+    :param size: Permutation size
+    :param seed: Permutation seed
+    :return: Permuted index in range(size)
+    """
+    half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+    mask = (1 << half_bits) - 1
+    value = index
+    while True:
+        left, right = value >> half_bits, value & mask
+        for round_no in range(ROUNDS):
+            left, right = right, left ^ (_round(right, seed, round_no) & mask)
+        value = (left << half_bits) | right
+        # Feistel network permutes range(4 ** half_bits), walk until in range
+        if value < size:
+            return value
+
+
+def new_seed() -> int:
+    return random.getrandbits(31)
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class SystemClock:
+    """
+    Wall clock, used by default
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    async def wait(self, event: asyncio.Event, timeout: Optional[float]) -> None:
+        """
+        Wait until event is set or timeout expires
+        :param event: Wakeup event
+        :param timeout: Seconds, None to wait for event only
+        :return:
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class VirtualClock:
+    """
+    Clock that moves only when advanced, for simulations and tests.
+    Waiters are woken on every advance and check the time themselves
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self._waiters: set[asyncio.Event] = set()
+
+    def time(self) -> float:
+        return self.now
+
+    async def wait(self, event: asyncio.Event, timeout: Optional[float]) -> None:
+        self._waiters.add(event)
+        try:
+            await event.wait()
+        finally:
+            self._waiters.discard(event)
+
+    def advance(self, seconds: float) -> None:
+        self.advance_to(self.now + seconds)
+
+    def advance_to(self, at: float) -> None:
+        """
+        Move time forward and wake waiters
+        :param at: New time, past values are ignored
+        :return:
+        """
+        self.now = max(self.now, at)
+        for event in self._waiters:
+            event.set()
@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import itertools
+import typing as t
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src.app.store.base.base_accessor import BaseAccessor
+from src.app.store.scheduler.clock import SystemClock
+
+if t.TYPE_CHECKING:
+    from src.app.web.app import Application
+
+
+@dataclass(order=True)
+class Deadline:
+    at: float
+    seq: int
+    game_id: int = field(compare=False)
+    event: str = field(compare=False)
+    cancelled: bool = field(compare=False, default=False)
+
+
+class DeadlineScheduler(BaseAccessor):
+    """
+    Single heap of game deadlines, served by one task. A game has at most
+    one pending deadline, scheduling a new one replaces the previous.
+    Due deadlines are passed to the update dispatcher, so they are handled
+    in order with the messages of the same chat.
+    Time is read from `clock`, replace it with VirtualClock to run games
+    faster than real time.
+    """
+
+    def __init__(self, app: "Application", *args, **kwargs):
+        super().__init__(app, *args, **kwargs)
+        self.clock = SystemClock()
+        self.is_running = False
+        self.run_task: Optional[asyncio.Task] = None
+        self._heap: list[Deadline] = []
+        self._deadlines: dict[int, Deadline] = {}
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def connect(self, app: "Application"):
+        self._wakeup = asyncio.Event()
+        self.is_running = True
+        self.run_task = asyncio.create_task(self.run())
+
+    async def disconnect(self, app: "Application"):
+        self.is_running = False
+        if self.run_task:
+            self._wakeup.set()
+            await self.run_task
+            self.run_task = None
+        self._heap.clear()
+        self._deadlines.clear()
+        self._cancelled = 0
+
+    def schedule(self, game_id: int, event: str, delay: float) -> Deadline:
+        """
+        Schedule game event
+        :param game_id: Game ID
+        :param event: Event name
+        :param delay: Seconds from now
+        :return: Deadline object
+        """
+        return self.schedule_at(game_id, event, self.clock.time() + delay)
+
+    def schedule_at(self, game_id: int, event: str, at: float) -> Deadline:
+        """
+        Schedule game event at given time
+        :param game_id: Game ID
+        :param event: Event name
+        :param at: Unix timestamp, past timestamps fire right away
+        :return: Deadline object
+        """
+        self.cancel(game_id)
+        deadline = Deadline(at=at, seq=next(self._seq), game_id=game_id, event=event)
+        self._deadlines[game_id] = deadline
+        heapq.heappush(self._heap, deadline)
+        if self._wakeup and self._heap[0] is deadline:
+            self._wakeup.set()
+        return deadline
+
+    def cancel(self, game_id: int) -> None:
+        """
+        Cancel pending game event, if any
+        :param game_id: Game ID
+        :return:
+        """
+        deadline = self._deadlines.pop(game_id, None)
+        if deadline is None:
+            return
+        deadline.cancelled = True
+        self._cancelled += 1
+        # drop cancelled entries once they make up most of the heap
+        if self._cancelled > len(self._heap) // 2:
+            self._heap = [d for d in self._heap if not d.cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def get_deadline(self, game_id: int) -> Optional[Deadline]:
+        return self._deadlines.get(game_id)
+
+    def next_at(self) -> Optional[float]:
+        """
+        Time of the earliest pending deadline
+        :return: Timestamp or None if nothing is scheduled
+        """
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+        return self._heap[0].at if self._heap else None
+
+    async def run(self):
+        while self.is_running:
+            now = self.clock.time()
+            while self._heap and self._heap[0].at <= now:
+                deadline = heapq.heappop(self._heap)
+                if deadline.cancelled:
+                    self._cancelled -= 1
+                    continue
+                del self._deadlines[deadline.game_id]
+                self.fire(deadline)
+
+            timeout = self._heap[0].at - now if self._heap else None
+            self._wakeup.clear()
+            await self.clock.wait(self._wakeup, timeout)
+
+    def fire(self, deadline: Deadline) -> None:
+        self.app.store.tg_api.dispatcher.submit_nowait(
+            deadline.game_id, self.app.store.bot_manager.handle_deadline, deadline
+        )
+
+    def __len__(self):
+        return len(self._deadlines)
@@ -1,78 +1,302 @@
-import asyncio
-import json
 import typing as t
 from typing import Optional, List
 
-from aiohttp.client import ClientSession
+from aiohttp import ClientTimeout, TCPConnector
+from aiohttp.client import ClientResponse, ClientSession
 from sqlalchemy import select
 
+from src.app.bot.cgk_config import CGKState
 from src.app.bot.models import GameModel, PlayerModel
+from src.app.bot.roster import Roster
 from src.app.store.base.base_accessor import BaseAccessor
+from src.app.store.tg_api.checkpoint import UpdateCheckpoint
 from src.app.store.tg_api.dataclasses import Message, Update, Chat, User, CallbackQuery
+from src.app.store.tg_api.decoding import dumps, loads
+from src.app.store.tg_api.dispatcher import UpdateDispatcher
 from src.app.store.tg_api.poller import Poller
+from src.app.store.tg_api.recorder import UpdateRecorder
+from src.app.store.tg_api.sender import CircuitOpenError, Sender, SendPriority, TgApiError
+from src.app.web.config import BotMode
 
 if t.TYPE_CHECKING:
     from src.app.web.app import Application
 
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+cgk_state = CGKState()
+
+
+def user_from_dict(raw_user: dict) -> User:
+    return User(
+        id=raw_user["id"],
+        is_bot=raw_user["is_bot"],
+        first_name=raw_user["first_name"],
+        username=raw_user.get("username"),
+    )
+
+
+def message_from_dict(raw_message: dict) -> Message:
+    raw_chat = raw_message["chat"]
+    return Message(
+        message_id=raw_message["message_id"],
+        text=raw_message.get("text"),
+        date=raw_message.get("date"),
+        chat=Chat(id=raw_chat["id"], type=raw_chat["type"], title=raw_chat.get("title")),
+        user=user_from_dict(raw_message["from"]),
+    )
+
 
 class TgApiAccessor(BaseAccessor):
     def __init__(self, app: "Application", *args, **kwargs):
         super().__init__(app, *args, **kwargs)
         self.session: Optional[ClientSession] = None
-        self.base_url = f"https://api.telegram.org/bot{self.app.config.bot.token}"
         self.poller: Optional[Poller] = None
+        self.sender: Optional[Sender] = None
+        self.dispatcher: Optional[UpdateDispatcher] = None
+        self.recorder: Optional[UpdateRecorder] = None
+        self.checkpoint: Optional[UpdateCheckpoint] = None
         self.offset: Optional[int] = None
         self.commands: Optional[List[str]] = None
 
+    @property
+    def base_url(self) -> str:
+        return f"{self.app.config.bot.api_url}/bot{self.app.config.bot.token}"
+
+    @property
+    def bot_id(self) -> int:
+        # token is "<bot id>:<secret>"
+        bot_id = self.app.config.bot.token.split(":")[0]
+        return int(bot_id) if bot_id.isdigit() else 0
+
+    def create_session(self) -> ClientSession:
+        """
+        HTTP session for Bot API calls with pooled keep-alive connections
+        :return: ClientSession
+        """
+        config = self.app.config.bot
+        connector = TCPConnector(
+            limit=config.connection_limit,
+            limit_per_host=config.connection_limit_per_host,
+            keepalive_timeout=config.keepalive_timeout,
+            ttl_dns_cache=config.dns_cache_ttl,
+        )
+        return ClientSession(
+            connector=connector,
+            timeout=ClientTimeout(
+                total=config.request_timeout,
+                connect=config.connect_timeout,
+            ),
+            json_serialize=dumps,
+        )
+
     async def connect(self, app: "Application"):
-        self.session = ClientSession()
+        await self.app.database.lock_instance(self.bot_id)
+        self.session = self.create_session()
         self.poller = Poller(self.app.store)
+        self.sender = Sender(self, self.app.config.bot)
+        self.dispatcher = UpdateDispatcher(self.handle_update, self.app.config.bot)
+        self.checkpoint = UpdateCheckpoint(self.app.database, self.app.config.bot, self.bot_id)
+        saved_update_id = await self.checkpoint.start()
+        if saved_update_id is not None:
+            self.offset = saved_update_id + 1
+        if self.app.config.bot.record_updates:
+            self.recorder = UpdateRecorder(self.app.config.bot.record_updates)
+            self.recorder.open()
+        await self.sender.start()
+        await self.dispatcher.start()
+        await self.app.store.bot_manager.restore_games()
         await self.set_initial_commands()
-        await self.poller.start()
+        if self.app.config.bot.mode == BotMode.WEBHOOK:
+            await self.set_webhook()
+        else:
+            await self.delete_webhook()
+            await self.poller.start()
 
     async def disconnect(self, app: "Application"):
         if self.poller:
             await self.poller.stop()
+        if self.dispatcher:
+            await self.dispatcher.stop()
+        if self.checkpoint:
+            await self.checkpoint.stop()
+        if self.sender:
+            await self.sender.stop()
         if self.session:
             await self.session.close()
+        if self.recorder:
+            self.recorder.close()
         self.session = None
+        self.recorder = None
         self.poller = None
+        self.sender = None
+        self.dispatcher = None
+        self.checkpoint = None
         self.offset = None
 
+    async def get_updates(self) -> list[dict]:
+        """
+        Long poll for the next batch of updates. Offset is moved past the
+        batch right away, so the next poll can start before it is handled
+        :return: Raw updates
+        """
+        config = self.app.config.bot
+        params = {
+            "limit": config.poll_limit,
+            "timeout": config.poll_timeout,
+            "allowed_updates": ALLOWED_UPDATES,
+        }
+        if self.offset:
+            params["offset"] = self.offset
+        # long poll is held by server for up to poll_timeout
+        timeout = ClientTimeout(
+            total=config.poll_timeout + config.request_timeout,
+            connect=config.connect_timeout,
+        )
+        get_updates_url = f"{self.base_url}/getUpdates"
+        async with self.session.post(get_updates_url, json=params, timeout=timeout) as response:
+            data = await self.read_response(response)
+        if not data.get("ok"):
+            raise TgApiError("getUpdates", data.get("error_code"), data.get("description"))
+
+        raw_updates = data["result"]
+        if self.recorder:
+            self.recorder.write(raw_updates)
+        if raw_updates:
+            # Increment offset by 1 to mark updates as accepted
+            self.offset = raw_updates[-1]["update_id"] + 1
+        return raw_updates
+
     async def poll(self) -> None:
         """
         Run a poll and handle incoming updates
         :return:
         """
+        for raw_update in await self.get_updates():
+            await self.handle_raw_update(raw_update)
+
+    async def handle_raw_update(self, raw_update: dict) -> None:
+        """
+        Filter raw update and pass it to bot manager. Shared by polling
+        and webhook modes
+        :param raw_update: Dict object received from getUpdates or webhook
+        :return:
+        """
+        update_id = raw_update["update_id"]
+        if not self.checkpoint.accept(update_id):
+            # redelivered update
+            return
+        try:
+            update = self.dict_to_dc(raw_update) if self.accepts(raw_update) else None
+            if update is not None:
+                await self.dispatcher.dispatch(update)
+                return
+        except Exception:
+            # update is not handled, it must not hold the offset back
+            self.checkpoint.done(update_id)
+            raise
+        self.checkpoint.done(update_id)
+
+    async def handle_update(self, update: Update) -> None:
+        """
+        Dispatcher handler, marks update as handled for offset checkpoint
+        :param update: Update object
+        :return:
+        """
+        try:
+            await self.app.store.bot_manager.handle_update(update)
+        finally:
+            self.checkpoint.done(update.update_id)
+
+    @staticmethod
+    def accepts(raw_update: dict) -> bool:
+        """
+        Check if raw update is worth handling
+        :param raw_update: Dict object received from getUpdates or webhook
+        :return: False for private chats and messages without text
+        """
+        # process only group messages
+        return "message" not in raw_update or (
+            raw_update["message"]["chat"]["type"] in ("supergroup", "group")
+            and bool(raw_update["message"].get("text"))
+        )
+
+    async def set_webhook(self) -> None:
+        """
+        Subscribe configured webhook url to bot updates
+        :return:
+        """
         params = {
-            "offset": self.offset or "",
-            "timeout": 60,
-            "allowed_updates": json.dumps(["message", "callback_query"]),
+            "url": self.app.config.bot.webhook_url,
+            "allowed_updates": ALLOWED_UPDATES,
         }
-        get_updates_url = f"{self.base_url}/getUpdates"
-        async with self.session.get(get_updates_url, params=params) as response:
-            data = await response.json()
-            for raw_update in data["result"]:
-                # process only group messages
-                if ("message" in raw_update) and (
-                        raw_update["message"]["chat"]["type"] not in ("supergroup", "group")
-                        or not raw_update["message"].get("text")
-                ):
-                    self.offset = raw_update["update_id"] + 1
-                    continue
-                update = self.dict_to_dc(raw_update)
-
-                asyncio.create_task(self.app.store.bot_manager.handle_update(update))
-
-                # Increment offset by 1 to mark updates as accepted
-                self.offset = update.update_id + 1
+        if self.app.config.bot.webhook_secret:
+            params["secret_token"] = self.app.config.bot.webhook_secret
+        await self.send("setWebhook", params, priority=SendPriority.SERVICE)
+
+    async def delete_webhook(self) -> None:
+        """
+        Remove webhook, so getUpdates can be used
+        :return:
+        """
+        await self.send("deleteWebhook", {}, priority=SendPriority.SERVICE)
+
+    async def call(self, method: str, params: dict) -> dict:
+        """
+        Make a Bot API request right away, bypassing outbound queue.
+        Parameters are sent as JSON body, nested objects like reply_markup
+        are passed as dicts
+        :param method: Bot API method name
+        :param params: Method parameters
+        :return: Decoded Bot API response
+        """
+        url = f"{self.base_url}/{method}"
+        async with self.session.post(url, json=params) as response:
+            return await self.read_response(response)
+
+    @staticmethod
+    async def read_response(response: ClientResponse) -> dict:
+        """
+        Decode Bot API response straight from body bytes, body is read once
+        :param response: Bot API response
+        :return: Decoded response, error payload for non JSON bodies
+        """
+        body = await response.read()
+        try:
+            return loads(body)
+        except ValueError:
+            # e.g. HTML error page of a proxy in front of Bot API
+            return {"ok": False, "error_code": response.status, "description": response.reason}
+
+    async def send(
+            self,
+            method: str,
+            params: dict,
+            chat_id: Optional[int] = None,
+            priority: SendPriority = SendPriority.MESSAGE,
+            critical: bool = True,
+    ):
+        """
+        Make a Bot API request through rate limited outbound queue
+        :param method: Bot API method name
+        :param params: Method parameters
+        :param chat_id: Chat ID to apply per chat rate limit to
+        :param priority: Outbound lane
+        :param critical: False if the request may be dropped while Bot API is failing
+        :return: `result` field of the Bot API response, None if request was dropped
+        """
+        # don't hold a database connection while the request waits in queue
+        await self.app.database.release()
+        try:
+            return await self.sender.submit(method, params, chat_id, priority, critical)
+        except CircuitOpenError:
+            # only non-critical requests are dropped
+            return None
 
     async def set_initial_commands(self) -> None:
         """
         Set initial commands for all group chats
         :return:
         """
-        set_commands_url = f"{self.base_url}/setMyCommands"
         commands = {
             "about": "Info",
             "rules": "Game rules",
@@ -83,12 +307,10 @@ class TgApiAccessor(BaseAccessor):
             "player_stats": "Personal game stats",
         }
         params = {
-            "commands": json.dumps(
-                [{"command": k, "description": v} for k, v in commands.items()]
-            ),
+            "commands": [{"command": k, "description": v} for k, v in commands.items()],
             "type": "all_group_chats",
         }
-        await self.session.get(set_commands_url, params=params)
+        await self.send("setMyCommands", params, priority=SendPriority.SERVICE)
 
     async def delete_commands(self, chat_id: int) -> None:
         """
@@ -96,86 +318,54 @@ class TgApiAccessor(BaseAccessor):
         :param chat_id: ID of a group chat to delete commands for
         :return:
         """
-        del_commands_url = f"{self.base_url}/deleteMyCommands"
         params = {
             "type": "chat",
             "chat_id": chat_id,
         }
-        await self.session.get(del_commands_url, params=params)
+        await self.send("deleteMyCommands", params, priority=SendPriority.SERVICE)
 
     @staticmethod
-    def dict_to_dc(raw_data: dict) -> Update:
+    def dict_to_dc(raw_data: dict) -> Optional[Update]:
         """
         Process dict to Update dataclass for further use. Only works with
-        messages from Group chats
+        messages from Group chats. Updates dropped by `accepts` never get
+        here, so nothing is built for them
         :param raw_data: Dict object received from getUpdates
         :return: Message class object with nested Chat, User, Message dataclasses
         """
-        if "message" in raw_data:
+        raw_message = raw_data.get("message")
+        if raw_message is not None:
             return Update(
                 update_id=raw_data["update_id"],
-                message=Message(
-                    message_id=raw_data["message"]["message_id"],
-                    date=raw_data["message"]["date"],
-                    text=raw_data["message"]["text"],
-                    chat=Chat(
-                        id=raw_data["message"]["chat"]["id"],
-                        type=raw_data["message"]["chat"]["type"],
-                        title=raw_data["message"]["chat"]["title"],
-                    ),
-                    user=User(
-                        id=raw_data["message"]["from"]["id"],
-                        is_bot=raw_data["message"]["from"]["is_bot"],
-                        first_name=raw_data["message"]["from"]["first_name"],
-                        username=raw_data["message"]["from"].get("username"),
-                    ),
-                ),
+                message=message_from_dict(raw_message),
             )
-        if "callback_query" in raw_data:
+        raw_cq = raw_data.get("callback_query")
+        if raw_cq is not None:
             return Update(
                 update_id=raw_data["update_id"],
                 callback_query=CallbackQuery(
-                    id=raw_data["callback_query"]["id"],
-                    data=raw_data["callback_query"].get("data"),
-                    user=User(
-                        id=raw_data["callback_query"]["from"]["id"],
-                        is_bot=raw_data["callback_query"]["from"]["is_bot"],
-                        first_name=raw_data["callback_query"]["from"]["first_name"],
-                        username=raw_data["callback_query"]["from"].get("username"),
-                    ),
-                    message=Message(
-                        message_id=raw_data["callback_query"]["message"]["message_id"],
-                        text=raw_data["callback_query"]["message"].get("text"),
-                        date=raw_data["callback_query"]["message"].get("date"),
-                        user=User(
-                            id=raw_data["callback_query"]["message"]["from"]["id"],
-                            is_bot=raw_data["callback_query"]["message"]["from"]["is_bot"],
-                            first_name=raw_data["callback_query"]["message"]["from"]["first_name"],
-                            username=raw_data["callback_query"]["message"]["from"].get("username"),
-                        ),
-                        chat=Chat(
-                            id=raw_data["callback_query"]["message"]["chat"]["id"],
-                            type=raw_data["callback_query"]["message"]["chat"]["type"],
-                            title=raw_data["callback_query"]["message"]["chat"]["title"],
-                        )
-                    ),
-                )
+                    id=raw_cq["id"],
+                    data=raw_cq.get("data"),
+                    user=user_from_dict(raw_cq["from"]),
+                    message=message_from_dict(raw_cq["message"]),
+                ),
             )
+        return None
 
-    async def send_message(self, chat_id: int, text: str) -> None:
+    async def send_message(self, chat_id: int, text: str, critical: bool = True) -> Optional[int]:
         """
         Send text message to chat
         :param chat_id: Chat ID
         :param text: Text to send to chat
-        :return:
+        :param critical: False for messages that may be dropped while Bot API is failing
+        :return: Integer, representing timestamp, None if message was dropped
         """
-        url = f"{self.base_url}/sendMessage"
         params = {
             "chat_id": chat_id,
             "text": text,
         }
-        resp = await self.session.get(url, params=params)
-        return (await resp.json())["result"]["date"]
+        result = await self.send("sendMessage", params, chat_id, critical=critical)
+        return result["date"] if result is not None else None
 
     async def reply_to_message(self, message: Message, text: str) -> None:
         """
@@ -189,8 +379,7 @@ class TgApiAccessor(BaseAccessor):
             "text": text,
             "reply_to_message_id": message.message_id,
         }
-        snd_msg_url = f"{self.base_url}/sendMessage"
-        await self.session.get(snd_msg_url, params=params)
+        await self.send("sendMessage", params, message.chat.id)
 
     async def send_inline_button(self, message: Message, data: str) -> None:
         """
@@ -199,55 +388,34 @@ class TgApiAccessor(BaseAccessor):
         :param data: Data in button
         :return:
         """
-        url = f"{self.base_url}/sendMessage"
         params = {
             "chat_id": message.chat.id,
             "text": "Press the button to join THE TEAM",
-            "reply_markup": json.dumps(
-                {
-                    "inline_keyboard": [[{"text": "Join the team",
-                                          "callback_data": data}]],
-                    "resize_keyboard": True,
-                    "one_time_keyboard": True,
-                }
-            ),
+            "reply_markup": {
+                "inline_keyboard": [[{"text": "Join the team",
+                                      "callback_data": data}]],
+                "resize_keyboard": True,
+                "one_time_keyboard": True,
+            },
         }
-        await self.session.get(url, params=params)
+        await self.send("sendMessage", params, message.chat.id)
 
-    async def send_choose_responder_buttons(self, game: GameModel, text: str) -> int:
+    async def send_choose_responder_buttons(self, game: GameModel, roster: Roster, text: str) -> int:
         """
         Send reply buttons with team player names for cap to choose responder
         :param game: GameModel object
+        :param roster: Roster of the game team
         :param text: Message text
         :return: Integer, representing timestamp
         """
-        url = f"{self.base_url}/sendMessage"
-        capitan = await self.get_player_by_id(game.cap_id)
         params = {
             "chat_id": game.id,
-            "text": f"{capitan.first_name} {text}",
-            "entities": json.dumps(
-              [{
-                  "type": "text_mention",
-                  "offset": 0,
-                  "length": len(capitan.first_name),
-                  "user": {
-                      "id": game.cap_id
-                  }
-              }]
-            ),
-            "reply_markup": json.dumps(
-                {
-                    "keyboard": [[{"text": f"{player.first_name}"}
-                                  for player in await self.get_team_players_models(game)]],
-                    "resize_keyboard": True,
-                    "one_time_keyboard": True,
-                    "selective": True
-                }
-            ),
+            "text": f"{roster.capitan_name} {text}",
+            "entities": roster.capitan_mention,
+            "reply_markup": roster.keyboard,
         }
-        resp = await self.session.get(url, params=params)
-        return (await resp.json())["result"]["date"]
+        result = await self.send("sendMessage", params, game.id)
+        return result["date"]
 
     async def remove_buttons(self, game: GameModel, text: str) -> int:
         """
@@ -256,14 +424,13 @@ class TgApiAccessor(BaseAccessor):
         :param text: Message text
         :return: Integer, representing timestamp
         """
-        url = f"{self.base_url}/sendMessage"
         params = {
             "chat_id": game.id,
             "text": text,
-            "reply_markup": json.dumps({"remove_keyboard": True}),
+            "reply_markup": {"remove_keyboard": True},
         }
-        resp = await self.session.get(url, params=params)
-        return (await resp.json())["result"]["date"]
+        result = await self.send("sendMessage", params, game.id)
+        return result["date"]
 
     async def answer_cq(self, cq: CallbackQuery, text: str):
         """
@@ -272,13 +439,15 @@ class TgApiAccessor(BaseAccessor):
         :param text: Message text
         :return:
         """
-        url = f"{self.base_url}/answerCallbackQuery"
         params = {
             "callback_query_id": cq.id,
             "text": text,
-            "show_alert": "false",
+            "show_alert": False,
         }
-        await self.session.get(url, params=params)
+        # notification only, game state doesn't depend on it
+        await self.send(
+            "answerCallbackQuery", params, priority=SendPriority.CALLBACK, critical=False
+        )
 
     async def get_game_by_message(self, message: Message) -> Optional[GameModel]:
         """
@@ -286,13 +455,41 @@ class TgApiAccessor(BaseAccessor):
         :param message: Message dataclass object
         :return: GameModel object
         """
+        return await self.get_game_by_id(message.chat.id)
+
+    async def get_game_by_id(self, game_id: int) -> Optional[GameModel]:
+        """
+        Get game from db by chat id
+        :param game_id: Chat ID
+        :return: GameModel object
+        """
+        stmt = (
+            select(GameModel)
+            .where(GameModel.id == game_id)
+        )
+        async with self.app.database.begin() as session:
+            result = await session.scalars(stmt)
+            game = result.one_or_none()
+            # games are written by game cache, not by the unit of work
+            if game is not None:
+                session.expunge(game)
+            return game
+
+    async def get_active_games(self) -> list[GameModel]:
+        """
+        Get all games, that are not off, in one query
+        :return: List of GameModel objects
+        """
         stmt = (
             select(GameModel)
-            .where(GameModel.id == message.chat.id)
+            .where(GameModel.status != cgk_state.OFF)
         )
-        async with self.app.database.session.begin() as session:
+        async with self.app.database.begin() as session:
             result = await session.scalars(stmt)
-            return result.one_or_none()
+            games = result.all()
+            for game in games:
+                session.expunge(game)
+            return games
 
     async def create_game_by_message(self, message: Message) -> GameModel:
         """
@@ -304,9 +501,11 @@ class TgApiAccessor(BaseAccessor):
             id=message.chat.id,
             update_time=message.date,
         )
-        async with self.app.database.session.begin() as session:
+        async with self.app.database.begin() as session:
             session.add(game_model)
-            return game_model
+        # committed right away, so the row exists before game cache flushes it
+        await self.app.database.release()
+        return game_model
 
     async def create_player_by_message(self, message: Message) -> PlayerModel:
         """
@@ -319,42 +518,37 @@ class TgApiAccessor(BaseAccessor):
             username=message.user.username if message.user.username else None,
             first_name=message.user.first_name,
         )
-        async with self.app.database.session.begin() as session:
-            session.add(player_model)
+        self.app.store.players.invalidate(player_model.id)
+        async with self.app.database.begin() as session:
+            # savepoint keeps the unit of work usable on duplicate player
+            async with session.begin_nested():
+                session.add(player_model)
             return player_model
 
-    async def get_player_by_name(self, game: GameModel, name: str) -> Optional[PlayerModel]:
-        """
-        Get PlayerModel by name. Useful when captain is selecting responder with
-        reply buttons
-        :param game: GameModel object
-        :param name: Player name
-        :return: PlayerModel object
-        """
-        stmt = (
-            select(PlayerModel)
-            .where(
-                (PlayerModel.first_name == name)
-                & (PlayerModel.id.in_(map(int, game.team_to_list())))
-            )
-        )
-        async with self.app.database.session.begin() as session:
-            result = await session.scalars(stmt)
-            return result.one_or_none()
-
     async def get_player_by_id(self, player_id: int) -> Optional[PlayerModel]:
         """
-        Get PlayerModel by id
+        Get PlayerModel by id, from player cache if possible
         :param player_id: ID of the player
         :return: PlayerModel
         """
+        player_id = int(player_id)
+        player = self.app.store.players.get(player_id)
+        if player is not None:
+            return player
         stmt = (
             select(PlayerModel)
-            .where(PlayerModel.id == int(player_id))
+            .where(PlayerModel.id == player_id)
         )
-        async with self.app.database.session.begin() as session:
+        # a stats flush committed meanwhile makes the row stale
+        version = self.app.store.players.version
+        async with self.app.database.begin() as session:
             result = await session.scalars(stmt)
-            return result.one_or_none()
+            player = result.one_or_none()
+            if player is not None:
+                # detached like cached players
+                session.expunge(player)
+                self.app.store.players.put(player, version)
+            return player
 
     async def get_team_players_models(self, game: GameModel) -> list[PlayerModel]:
         """
@@ -367,6 +561,6 @@ class TgApiAccessor(BaseAccessor):
             select(PlayerModel)
             .where(PlayerModel.id.in_(map(int, game.team_to_list())))
         )
-        async with self.app.database.session.begin() as session:
+        async with self.app.database.begin() as session:
             result = await session.scalars(stmt)
             return result.all()
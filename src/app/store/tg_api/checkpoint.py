@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import typing as t
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.app.bot.models import UpdateOffsetModel
+
+if t.TYPE_CHECKING:
+    from src.app.store.database import Database
+    from src.app.web.config import BotConfig
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateCheckpoint:
+    """
+    Tracks handled updates. The highest update_id below which every
+    update is handled is saved to database in batches, so after restart
+    polling resumes right after it. Ids of recent updates are kept in a
+    ring, so redelivered updates are dropped without touching database.
+    """
+
+    def __init__(self, database: "Database", config: "BotConfig", bot_id: int):
+        self.database = database
+        self.config = config
+        self.bot_id = bot_id
+        self.saved: Optional[int] = None
+        self.flush_task: Optional[asyncio.Task] = None
+        self._received: Optional[int] = None
+        self._in_progress: set[int] = set()
+        self._ring: deque[int] = deque()
+        self._seen: set[int] = set()
+        self.duplicates = 0
+
+    async def start(self) -> Optional[int]:
+        """
+        Load saved checkpoint and start flushing
+        :return: Last handled update_id, None on first run
+        """
+        async with self.database.begin() as session:
+            self.saved = await session.scalar(
+                select(UpdateOffsetModel.update_id).where(
+                    UpdateOffsetModel.id == self.bot_id
+                )
+            )
+        self._received = self.saved
+        self.flush_task = asyncio.create_task(self.run())
+        return self.saved
+
+    async def stop(self) -> None:
+        if self.flush_task:
+            self.flush_task.cancel()
+            await asyncio.gather(self.flush_task, return_exceptions=True)
+            self.flush_task = None
+        await self.flush()
+
+    def accept(self, update_id: int) -> bool:
+        """
+        Register incoming update
+        :param update_id: Update ID
+        :return: False if update was already received
+        """
+        # redelivered updates are recent, older ones start a new sequence
+        window = self.config.seen_updates_size
+        if self._received is not None and update_id < self._received - window:
+            self.reset(update_id)
+        if update_id in self._seen or (self.saved is not None and update_id <= self.saved):
+            self.duplicates += 1
+            return False
+        self._seen.add(update_id)
+        self._ring.append(update_id)
+        if len(self._ring) > self.config.seen_updates_size:
+            self._seen.discard(self._ring.popleft())
+
+        self._in_progress.add(update_id)
+        if self._received is None or update_id > self._received:
+            self._received = update_id
+        return True
+
+    def reset(self, update_id: int) -> None:
+        """
+        Forget received ids. Bot API may restart update ids after a long
+        idle period, new ones would be dropped as duplicates otherwise
+        :param update_id: First update_id of the new sequence
+        :return:
+        """
+        logger.warning("Update ids restarted at %s, saved %s", update_id, self.saved)
+        self.saved = self._received = None
+        self._in_progress.clear()
+        self._ring.clear()
+        self._seen.clear()
+
+    def done(self, update_id: int) -> None:
+        """
+        Mark update as handled, or skipped
+        :param update_id: Update ID
+        :return:
+        """
+        self._in_progress.discard(update_id)
+
+    @property
+    def watermark(self) -> Optional[int]:
+        """
+        Highest update_id such that all received updates up to it are handled
+        """
+        if self._in_progress:
+            return min(self._in_progress) - 1
+        return self._received
+
+    async def flush(self) -> None:
+        """
+        Save watermark if it moved
+        :return:
+        """
+        watermark = self.watermark
+        if watermark is None or (self.saved is not None and watermark <= self.saved):
+            return
+        stmt = insert(UpdateOffsetModel).values(id=self.bot_id, update_id=watermark)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UpdateOffsetModel.id],
+            set_={"update_id": stmt.excluded.update_id},
+        )
+        async with self.database.begin() as session:
+            await session.execute(stmt)
+        self.saved = watermark
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.config.offset_flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to save update offset")
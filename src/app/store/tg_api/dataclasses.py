@@ -1,7 +1,23 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
-@dataclass
+def parse_command(text: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    """
+    Split `/command@bot_username arguments` message text
+    :param text: Message text
+    :return: Command and bot username, None for missing parts
+    """
+    if not text or text[0] != "/":
+        return None, None
+    words = text[1:].split(maxsplit=1)
+    if not words:
+        return None, None
+    command, _, username = words[0].partition("@")
+    return command or None, username or None
+
+
+@dataclass(slots=True)
 class User:
     id: int
     is_bot: bool
@@ -9,7 +25,7 @@ class User:
     username: str = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Chat:
     id: int
     type: str
@@ -18,16 +34,23 @@ class Chat:
     title: str = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Message:
     message_id: int
     text: str = None
     date: int = None
     user: User = None
     chat: Chat = None
+    # parsed from text once, on creation
+    command: str = None
+    command_to: str = None
+
+    def __post_init__(self):
+        if self.command is None:
+            self.command, self.command_to = parse_command(self.text)
 
 
-@dataclass
+@dataclass(slots=True)
 class CallbackQuery:
     id: int
     user: User
@@ -35,7 +58,7 @@ class CallbackQuery:
     data: str = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Update:
     update_id: int
     message: Message = None
@@ -0,0 +1,22 @@
+"""
+JSON codec for Bot API requests, responses and webhook bodies. orjson
+is used when installed, it is optional and not in requirements
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# str or bytes in, decoded object out
+loads = orjson.loads if orjson is not None else json.loads
+
+
+def dumps(obj) -> str:
+    """
+    Encode Bot API request body
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import typing as t
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Optional
+
+from src.app.store.tg_api.dataclasses import Update
+
+if t.TYPE_CHECKING:
+    from src.app.web.config import BotConfig
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DispatcherStats:
+    received: int = 0
+    processed: int = 0
+    failed: int = 0
+    pending: int = 0
+    in_flight: int = 0
+    max_pending: int = 0
+    max_chat_depth: int = 0
+    paused: int = 0
+
+
+class UpdateDispatcher:
+    """
+    Runs update handlers on a pool of workers. Every chat has its own
+    bounded queue, and only one worker at a time takes updates from it,
+    so updates are handled strictly in order inside a chat and in
+    parallel across chats.
+    """
+
+    def __init__(
+            self,
+            handler: Callable[[Update], Awaitable[None]],
+            config: "BotConfig",
+    ):
+        self.handler = handler
+        self.config = config
+        self.stats = DispatcherStats()
+        self._queues: dict[int, deque[tuple[Callable, Any]]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._accepting = asyncio.Event()
+        self._space_freed = asyncio.Condition()
+        self._space_waiters = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    async def start(self):
+        self._ready = asyncio.Queue()
+        self._accepting.set()
+        self._workers = [
+            asyncio.create_task(self.work())
+            for _ in range(self.config.dispatcher_workers)
+        ]
+
+    async def stop(self):
+        # queued updates are already confirmed to Telegram, handle them first
+        try:
+            await asyncio.wait_for(self._drained.wait(), self.config.dispatcher_stop_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dispatcher stopped with %s pending updates", self.stats.pending)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queues.clear()
+        self.stats.pending = 0
+        self._drained.set()
+
+    async def dispatch(self, update: Update) -> None:
+        """
+        Put update to its chat queue. Waits while the chat queue is full
+        :param update: Update object
+        :return:
+        """
+        chat_id = self.get_chat_id(update)
+        queue = self._queues.get(chat_id)
+        if queue is not None and len(queue) >= self.config.chat_queue_size:
+            self._space_waiters += 1
+            try:
+                async with self._space_freed:
+                    await self._space_freed.wait_for(
+                        lambda: len(self._queues.get(chat_id, ())) < self.config.chat_queue_size
+                    )
+            finally:
+                self._space_waiters -= 1
+
+        self.submit_nowait(chat_id, self.handler, update)
+
+    def submit_nowait(self, chat_id: int, handler: Callable[[Any], Awaitable[None]], item) -> None:
+        """
+        Put a job to chat queue regardless of its size. Used for internal
+        events, like game deadlines, that must be ordered with chat updates
+        :param chat_id: Chat ID
+        :param handler: Coroutine function to call with item
+        :param item: Handler argument
+        :return:
+        """
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            self._ready.put_nowait(chat_id)
+        queue.append((handler, item))
+
+        self.stats.received += 1
+        self.stats.pending += 1
+        self._drained.clear()
+        self.stats.max_pending = max(self.stats.max_pending, self.stats.pending)
+        self.stats.max_chat_depth = max(self.stats.max_chat_depth, len(queue))
+        if self.stats.pending >= self.config.max_pending_updates and self._accepting.is_set():
+            self.stats.paused += 1
+            self._accepting.clear()
+
+    async def work(self):
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._queues[chat_id]
+            handler, item = queue.popleft()
+            self.stats.in_flight += 1
+            try:
+                await handler(item)
+                self.stats.processed += 1
+            except Exception:
+                self.stats.failed += 1
+                logger.exception("Failed to handle %r", item)
+            finally:
+                self.stats.in_flight -= 1
+                self.stats.pending -= 1
+                if queue:
+                    self._ready.put_nowait(chat_id)
+                else:
+                    del self._queues[chat_id]
+                if not self.stats.pending:
+                    self._drained.set()
+                if self.stats.pending <= self.config.max_pending_updates // 2:
+                    self._accepting.set()
+                if self._space_waiters:
+                    async with self._space_freed:
+                        self._space_freed.notify_all()
+
+    async def wait_accepting(self) -> None:
+        """
+        Wait until the number of pending updates drops below the limit.
+        Pollers call it before fetching more updates
+        """
+        await self._accepting.wait()
+
+    def get_stats(self) -> dict:
+        return {**asdict(self.stats), "chats": len(self._queues)}
+
+    @staticmethod
+    def get_chat_id(update: Update) -> int:
+        if update.message:
+            return update.message.chat.id
+        return update.callback_query.message.chat.id
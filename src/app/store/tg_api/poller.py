@@ -1,27 +1,80 @@
 import asyncio
+import logging
 from asyncio import Task
 from typing import Optional
 
 from src.app.store import Store
+from src.app.store.tg_api.sender import backoff_delay
+
+logger = logging.getLogger(__name__)
 
 
 class Poller:
+    """
+    Long polling as a pipeline. One task fetches getUpdates batches and
+    starts the next request as soon as the offset is known, another one
+    filters, parses and dispatches fetched batches.
+    """
+
     def __init__(self, store: Store):
         self.store = store
         self.is_running = False
         self.poll_task: Optional[Task] = None
+        self.dispatch_task: Optional[Task] = None
+        self.batches: Optional[asyncio.Queue] = None
 
     async def start(self):
-        self.poll_task = self.poll()
+        self.batches = asyncio.Queue(self.store.tg_api.app.config.bot.poll_prefetch)
         self.is_running = True
-        asyncio.create_task(self.poll_task)
+        self.poll_task = asyncio.create_task(self.poll())
+        self.dispatch_task = asyncio.create_task(self.dispatch())
 
     async def stop(self):
         self.is_running = False
         if self.poll_task:
-            await self.poll_task
+            # interrupts pending long poll
+            self.poll_task.cancel()
+            await asyncio.gather(self.poll_task, return_exceptions=True)
             self.poll_task = None
+        if self.dispatch_task:
+            # fetched updates are already confirmed, don't drop them
+            await self.batches.join()
+            self.dispatch_task.cancel()
+            await asyncio.gather(self.dispatch_task, return_exceptions=True)
+            self.dispatch_task = None
 
     async def poll(self):
+        config = self.store.tg_api.app.config.bot
+        failures = 0
         while self.is_running:
-            await self.store.tg_api.poll()
+            # backpressure: don't fetch more while handlers are behind
+            await self.store.tg_api.dispatcher.wait_accepting()
+            try:
+                raw_updates = await self.store.tg_api.get_updates()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                failures += 1
+                logger.exception("getUpdates failed %d times in a row", failures)
+                await asyncio.sleep(
+                    backoff_delay(failures, config.retry_base_delay, config.retry_max_delay)
+                )
+                continue
+            failures = 0
+            if raw_updates:
+                await self.batches.put(raw_updates)
+
+    async def dispatch(self):
+        while True:
+            raw_updates = await self.batches.get()
+            try:
+                for raw_update in raw_updates:
+                    # offsets are confirmed, a failed update is skipped alone
+                    try:
+                        await self.store.tg_api.handle_raw_update(raw_update)
+                    except Exception:
+                        logger.exception(
+                            "Failed to dispatch update %s", raw_update.get("update_id")
+                        )
+            finally:
+                self.batches.task_done()
@@ -0,0 +1,50 @@
+import gzip
+import json
+import time
+from typing import Iterator, Optional, TextIO
+
+
+class UpdateRecorder:
+    """
+    Appends getUpdates results to gzip compressed JSONL file, one line
+    per non-empty batch: {"time": <unix time received>, "updates": [...]}.
+    Captures are replayed with `python -m src.tools.replay_updates`
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[TextIO] = None
+
+    def open(self) -> None:
+        # every run appends a new gzip member, readers see one stream
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def write(self, updates: list[dict]) -> None:
+        """
+        Record one getUpdates result
+        :param updates: Raw updates
+        :return:
+        """
+        if not updates or self._file is None:
+            return
+        self._file.write(json.dumps({"time": time.time(), "updates": updates}) + "\n")
+        # keep the capture readable if the process is killed
+        self._file.flush()
+
+
+def read_capture(path: str) -> Iterator[tuple[float, list[dict]]]:
+    """
+    Read batches recorded by UpdateRecorder
+    :param path: Capture file
+    :return: Iterator of receive time and raw updates
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                batch = json.loads(line)
+                yield batch["time"], batch["updates"]
@@ -0,0 +1,413 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import typing as t
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Optional
+
+from aiohttp import ClientError
+
+if t.TYPE_CHECKING:
+    from src.app.store.tg_api.accessor import TgApiAccessor
+    from src.app.web.config import BotConfig
+
+logger = logging.getLogger(__name__)
+
+# transport failures worth retrying: connection errors and timeouts
+NETWORK_ERRORS = (ClientError, asyncio.TimeoutError)
+
+
+class TgApiError(Exception):
+    def __init__(self, method: str, error_code: Optional[int], description: str):
+        super().__init__(f"{method}: {error_code} {description}")
+        self.method = method
+        self.error_code = error_code
+        self.description = description
+
+    @property
+    def retryable(self) -> bool:
+        """
+        Server side or rate limit errors may pass on retry, other 4xx won't
+        """
+        return self.error_code is None or self.error_code == 429 or self.error_code >= 500
+
+
+class CircuitOpenError(TgApiError):
+    """
+    Non-critical request dropped while Bot API is failing
+    """
+
+    def __init__(self, method: str):
+        super().__init__(method, None, "circuit breaker is open")
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Exponential backoff with full jitter, so retries of many callers
+    don't line up
+    :param attempt: Failed attempts so far, starting with 1
+    :param base: Delay ceiling after the first failure, seconds
+    :param cap: Maximal delay ceiling, seconds
+    :return: Seconds to wait before next attempt
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive retryable failures. While
+    open, only critical requests are sent. After `reset_timeout` it is
+    half open: the next success closes it, the next failure opens it again
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    def state(self, now: float) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if now - self.opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allows(self, critical: bool) -> bool:
+        return critical or self.opened_at is None
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Bot API recovered, circuit breaker closed")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        state = self.state(now)
+        if state == self.HALF_OPEN or (
+                state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            if state == self.CLOSED:
+                logger.warning("Bot API is failing, circuit breaker opened")
+            self.opened_at = now
+
+
+class SendPriority(IntEnum):
+    """
+    Outbound lanes. Lower value is sent first
+    """
+    CALLBACK = 0
+    MESSAGE = 1
+    SERVICE = 2
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = asyncio.get_running_loop().time()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Seconds to wait before a token is available
+        :param now: Event loop time
+        :return: 0 if token can be taken right now
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float) -> None:
+        """
+        Stop giving tokens for a while, used to honour `retry_after`
+        """
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+
+    @property
+    def idle(self) -> bool:
+        return self.tokens >= self.capacity
+
+
+@dataclass(order=True)
+class OutboundRequest:
+    priority: int
+    seq: int
+    method: str = field(compare=False)
+    params: dict = field(compare=False)
+    chat_id: Optional[int] = field(compare=False, default=None)
+    future: asyncio.Future = field(compare=False, default=None)
+    attempts: int = field(compare=False, default=0)
+    # non-critical requests are dropped while circuit breaker is open
+    critical: bool = field(compare=False, default=True)
+
+
+class Sender:
+    """
+    Central outbound dispatcher for Bot API calls.
+    Requests are ordered by priority lane, limited by a global token bucket
+    and by a token bucket per chat. Requests to the same chat are sent one
+    at a time and in submit order. Network errors and 5xx responses are
+    retried with jittered backoff, a circuit breaker sheds non-critical
+    requests while they keep failing.
+    """
+
+    def __init__(self, tg_api: "TgApiAccessor", config: "BotConfig"):
+        self.tg_api = tg_api
+        self.config = config
+        self.is_running = False
+        self.send_task: Optional[asyncio.Task] = None
+        self._seq = itertools.count()
+        self._ready: list[OutboundRequest] = []
+        self._delayed: list[tuple[float, OutboundRequest]] = []
+        self._chat_queues: dict[int, deque[OutboundRequest]] = {}
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._global_bucket: Optional[TokenBucket] = None
+        self._in_flight: set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self.breaker = CircuitBreaker(
+            config.breaker_failure_threshold, config.breaker_reset_timeout
+        )
+        self.retries = 0
+        self.shed = 0
+
+    async def start(self):
+        self._global_bucket = TokenBucket(
+            self.config.global_rate_limit, self.config.global_burst
+        )
+        self.is_running = True
+        self.send_task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self.is_running = False
+        self._wakeup.set()
+        if self.send_task:
+            await self.send_task
+            self.send_task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        for request in self._pending_requests():
+            if not request.future.done():
+                request.future.cancel()
+        self._ready.clear()
+        self._delayed.clear()
+        self._chat_queues.clear()
+
+    def submit(
+            self,
+            method: str,
+            params: dict,
+            chat_id: Optional[int] = None,
+            priority: SendPriority = SendPriority.MESSAGE,
+            critical: bool = True,
+    ) -> asyncio.Future:
+        """
+        Put Bot API call to outbound queue
+        :param method: Bot API method name
+        :param params: Method parameters
+        :param chat_id: Chat ID the call is limited by, None for chat-less calls
+        :param priority: Outbound lane
+        :param critical: False if the call may be dropped while Bot API is failing
+        :return: Future, resolved with `result` field of the Bot API response,
+        CircuitOpenError for dropped calls
+        """
+        request = OutboundRequest(
+            priority=priority,
+            seq=next(self._seq),
+            method=method,
+            params=params,
+            chat_id=chat_id,
+            future=asyncio.get_running_loop().create_future(),
+            critical=critical,
+        )
+        if not self.breaker.allows(critical):
+            self.shed += 1
+            request.future.set_exception(CircuitOpenError(method))
+            return request.future
+        if chat_id is None:
+            heapq.heappush(self._ready, request)
+        else:
+            queue = self._chat_queues.setdefault(chat_id, deque())
+            queue.append(request)
+            # only the head of a chat queue competes for sending
+            if len(queue) == 1:
+                heapq.heappush(self._ready, request)
+        self._wakeup.set()
+        return request.future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while self.is_running:
+            now = loop.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                heapq.heappush(self._ready, heapq.heappop(self._delayed)[1])
+
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            if self._ready:
+                global_delay = self._global_bucket.delay(now)
+                if global_delay:
+                    timeout = global_delay if timeout is None else min(timeout, global_delay)
+                else:
+                    self._send_next(now)
+                    continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _send_next(self, now: float) -> None:
+        request = heapq.heappop(self._ready)
+        if not self.breaker.allows(request.critical):
+            # queued before the breaker opened
+            self.shed += 1
+            self._finish(request, exception=CircuitOpenError(request.method))
+            return
+        if request.chat_id is not None:
+            bucket = self._chat_bucket(request.chat_id)
+            chat_delay = bucket.delay(now)
+            if chat_delay:
+                heapq.heappush(self._delayed, (now + chat_delay, request))
+                return
+            bucket.take()
+        self._global_bucket.take()
+        task = asyncio.create_task(self._dispatch(request))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, request: OutboundRequest) -> None:
+        loop = asyncio.get_running_loop()
+        request.attempts += 1
+        try:
+            data = await self.tg_api.call(request.method, request.params)
+        except NETWORK_ERRORS as e:
+            self._retry(request, e)
+            return
+        except Exception as e:
+            self._finish(request, exception=e)
+            return
+
+        if data.get("ok"):
+            self.breaker.record_success()
+            self._finish(request, result=data.get("result"))
+            return
+
+        retry_after = data.get("parameters", {}).get("retry_after")
+        if (
+                data.get("error_code") == 429
+                and retry_after is not None
+                and request.attempts <= self.config.max_send_retries
+        ):
+            bucket = (
+                self._global_bucket if request.chat_id is None
+                else self._chat_bucket(request.chat_id)
+            )
+            bucket.block(loop.time(), retry_after)
+            # keeps its seq, so the request stays first in its chat queue
+            heapq.heappush(self._ready, request)
+            self._wakeup.set()
+            return
+
+        error = TgApiError(request.method, data.get("error_code"), data.get("description"))
+        if error.retryable:
+            self._retry(request, error)
+            return
+        # Bot API is up, request itself is wrong
+        self.breaker.record_success()
+        self._finish(request, exception=error)
+
+    def _retry(self, request: OutboundRequest, error: Exception) -> None:
+        """
+        Send request again after backoff, or fail it when out of attempts
+        """
+        now = asyncio.get_running_loop().time()
+        self.breaker.record_failure(now)
+        if request.attempts > self.config.max_send_retries or not self.is_running:
+            self._finish(request, exception=error)
+            return
+        self.retries += 1
+        delay = backoff_delay(
+            request.attempts, self.config.retry_base_delay, self.config.retry_max_delay
+        )
+        # keeps its seq, so the request stays first in its chat queue
+        heapq.heappush(self._delayed, (now + delay, request))
+        self._wakeup.set()
+
+    def _finish(self, request: OutboundRequest, result=None, exception=None) -> None:
+        if not request.future.done():
+            if exception is not None:
+                request.future.set_exception(exception)
+            else:
+                request.future.set_result(result)
+
+        if request.chat_id is None:
+            return
+        queue = self._chat_queues[request.chat_id]
+        queue.popleft()
+        if queue:
+            heapq.heappush(self._ready, queue[0])
+            self._wakeup.set()
+        else:
+            del self._chat_queues[request.chat_id]
+            self._forget_idle_buckets()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.config.chat_rate_limit, self.config.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _forget_idle_buckets(self) -> None:
+        if len(self._chat_buckets) < self.config.max_chat_buckets:
+            return
+        now = asyncio.get_running_loop().time()
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            if chat_id in self._chat_queues:
+                continue
+            bucket.delay(now)
+            if bucket.idle:
+                del self._chat_buckets[chat_id]
+
+    def _pending_requests(self):
+        yield from self._ready
+        yield from (request for _, request in self._delayed)
+        for queue in self._chat_queues.values():
+            yield from queue
+
+    @property
+    def idle(self) -> bool:
+        """
+        Nothing is queued or in flight
+        """
+        return not (self._ready or self._delayed or self._chat_queues or self._in_flight)
+
+    def get_stats(self) -> dict:
+        return {
+            "queued": sum(len(queue) for queue in self._chat_queues.values()) + sum(
+                1 for request in self._ready if request.chat_id is None
+            ),
+            "retries": self.retries,
+            "shed": self.shed,
+        }
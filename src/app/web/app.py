@@ -47,6 +47,10 @@ class View(AiohttpView):
     def data(self) -> dict:
         return self.request.get("data", {})
 
+    @property
+    def querystring(self) -> dict:
+        return self.request.get("querystring", {})
+
 
 app = Application()
 
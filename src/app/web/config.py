@@ -18,9 +18,65 @@ class AdminConfig:
     password: str
 
 
+@dataclass
+class BotMode:
+    POLLING: str = "polling"
+    WEBHOOK: str = "webhook"
+
+
 @dataclass
 class BotConfig:
     token: str
+    api_url: str = "https://api.telegram.org"
+    # bot username, commands like /start_game@other_bot are ignored if set
+    username: t.Optional[str] = None
+    mode: str = BotMode.POLLING
+    webhook_url: t.Optional[str] = None
+    webhook_secret: t.Optional[str] = None
+    global_rate_limit: float = 30
+    global_burst: int = 30
+    chat_rate_limit: float = 1
+    chat_burst: int = 3
+    max_send_retries: int = 3
+    # jittered exponential backoff of retried Bot API calls, seconds
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 30
+    # consecutive failed calls that open the circuit breaker, and seconds
+    # it stays open before a call is let through again
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30
+    max_chat_buckets: int = 10000
+    dispatcher_workers: int = 64
+    chat_queue_size: int = 100
+    max_pending_updates: int = 5000
+    # seconds to finish queued updates on shutdown
+    dispatcher_stop_timeout: float = 30
+    poll_limit: int = 100
+    poll_timeout: int = 60
+    # fetched getUpdates batches waiting for dispatch
+    poll_prefetch: int = 2
+    # update offset is saved every interval, seconds
+    offset_flush_interval: float = 1.0
+    # ids of recent updates kept to drop redelivered ones, an update_id
+    # further below the last received one means Bot API restarted ids
+    seen_updates_size: int = 10000
+    # gzip JSONL file to record getUpdates results to, off if not set
+    record_updates: t.Optional[str] = None
+    # Bot API HTTP client: open connections in total and to api_url host
+    connection_limit: int = 100
+    connection_limit_per_host: int = 50
+    # idle connections are kept open for reuse, seconds
+    keepalive_timeout: float = 60
+    # resolved api_url host is cached, seconds
+    dns_cache_ttl: int = 300
+    # Bot API request timeouts, seconds. getUpdates also waits poll_timeout
+    request_timeout: float = 10
+    connect_timeout: float = 5
+
+    def __post_init__(self):
+        # webhook requests are authenticated by the secret token only
+        if self.mode == BotMode.WEBHOOK and not (self.webhook_url and self.webhook_secret):
+            raise ValueError("webhook mode requires webhook_url and webhook_secret")
 
 
 @dataclass
@@ -31,6 +87,17 @@ class DatabaseConfig:
     host: str = "localhost"
     port: int = 5432
     dialect: str = "postgresql+asyncpg"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_pre_ping: bool = False
+    # seconds, -1 to never recycle connections
+    pool_recycle: int = -1
+    # open pool_size connections on startup
+    pool_warmup: bool = True
+    # asyncpg caches, 0 disables
+    statement_cache_size: int = 100
+    prepared_statement_cache_size: int = 100
 
     def get_db_url(self) -> str:
         """
@@ -40,12 +107,24 @@ class DatabaseConfig:
         return f"{self.dialect}://{self.user}:{self.password}@{self.host}:{self.port}/{self.db_name}"
 
 
+@dataclass
+class CacheConfig:
+    game_flush_interval: float = 1.0
+    game_idle_ttl: float = 600
+    # player rows cached for get_player_by_id, seconds they stay valid
+    player_cache_size: int = 10000
+    player_ttl: float = 300
+    # stats counter increments are written every interval, seconds
+    stats_flush_interval: float = 1.0
+
+
 @dataclass
 class Config:
     admin: AdminConfig
     session: SessionConfig = None
     bot: BotConfig = None
     database: DatabaseConfig = None
+    cache: CacheConfig = None
 
 
 def setup_config(app: "Application", config_path: str):
@@ -61,8 +140,7 @@ def setup_config(app: "Application", config_path: str):
             email=raw_config["admin"]["email"],
             password=raw_config["admin"]["password"],
         ),
-        bot=BotConfig(
-            token=raw_config["bot"]["token"],
-        ),
+        bot=BotConfig(**raw_config["bot"]),
         database=DatabaseConfig(**raw_config["database"]),
+        cache=CacheConfig(**raw_config.get("cache", {})),
     )
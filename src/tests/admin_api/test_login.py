@@ -1,4 +1,8 @@
+from unittest.mock import AsyncMock
+
 from src.app.store import Store
+from src.app.store.tg_api.dispatcher import UpdateDispatcher
+from src.app.store.tg_api.sender import Sender
 
 
 class TestAdminLoginView:
@@ -57,3 +61,27 @@ class TestAdminLoginView:
         assert resp.status == 405
         data = await resp.json()
         assert data["status"] == "not_implemented"
+
+
+class TestAdminStatsView:
+    async def test_unauthorized(self, cli):
+        resp = await cli.get("/admin.stats")
+        assert resp.status == 401
+
+    async def test_success(self, authed_cli, config, store: Store, monkeypatch):
+        # tg_api is mocked in test app
+        monkeypatch.setattr(
+            store.tg_api, "dispatcher", UpdateDispatcher(AsyncMock(), config.bot)
+        )
+        monkeypatch.setattr(store.tg_api, "sender", Sender(AsyncMock(), config.bot))
+        resp = await authed_cli.get("/admin.stats")
+        assert resp.status == 200
+        data = await resp.json()
+        pool = data["data"]["database"]
+        assert pool["size"] == config.database.pool_size
+        assert pool["checked_out"] == 0
+        assert {"overflow", "wait_avg", "wait_max", "connect_avg", "connect_max"} <= pool.keys()
+        assert "dropped" in data["data"]["update_filter"]
+        assert {"size", "hits", "misses"} <= data["data"]["player_cache"].keys()
+        assert {"pending", "max_chat_depth", "chats"} <= data["data"]["dispatcher"].keys()
+        assert data["data"]["sender"] == {"queued": 0, "retries": 0, "shed": 0}
@@ -1,9 +1,12 @@
+import json
+
 import pytest
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 
 from src.app.quiz.models import Question, QuestionModel
 from src.app.quiz.schemes import QuestionSchema
+from src.app.quiz.views import MAX_LINE_SIZE
 from src.app.store import Store
 from src.tests.utils import check_empty_table_exists
 from src.tests.utils import ok_response
@@ -110,3 +113,112 @@ class TestQuestionListView:
                 "questions": QuestionSchema().dump([question_1, question_2], many=True)
             }
         )
+
+    async def test_keyset_pages(self, authed_cli, question_1: Question, question_2):
+        resp = await authed_cli.get("/quiz.list_questions", params={"limit": 1})
+        assert resp.status == 200
+        data = await resp.json()
+        assert data == ok_response(
+            data={
+                "questions": [QuestionSchema().dump(question_1)],
+                "next_after_id": question_1.id,
+            }
+        )
+
+        resp = await authed_cli.get(
+            "/quiz.list_questions", params={"limit": 2, "after_id": question_1.id}
+        )
+        data = await resp.json()
+        assert data == ok_response(
+            data={"questions": [QuestionSchema().dump(question_2)], "next_after_id": None}
+        )
+
+    async def test_ndjson(self, authed_cli, question_1: Question, question_2):
+        resp = await authed_cli.get("/quiz.list_questions", params={"format": "ndjson"})
+        assert resp.status == 200
+        assert resp.content_type == "application/x-ndjson"
+        lines = (await resp.text()).splitlines()
+        assert [json.loads(line) for line in lines] == QuestionSchema().dump(
+            [question_1, question_2], many=True
+        )
+
+        resp = await authed_cli.get(
+            "/quiz.list_questions", params={"format": "ndjson", "limit": 1}
+        )
+        lines = (await resp.text()).splitlines()
+        assert [json.loads(line) for line in lines] == [QuestionSchema().dump(question_1)]
+
+    async def test_wrong_limit(self, authed_cli):
+        resp = await authed_cli.get("/quiz.list_questions", params={"limit": 0})
+        assert resp.status == 400
+
+
+class TestQuestionImportView:
+    async def test_unauthorized(self, cli):
+        resp = await cli.post("/quiz.import_questions", data="")
+        assert resp.status == 401
+
+    async def test_csv(self, authed_cli, store: Store, question_1: Question):
+        body = (
+            "title,answer\n"
+            "new question,new answer\n"
+            f"{question_1.title},{question_1.answer}\n"
+            "no answer\n"
+        )
+        resp = await authed_cli.post(
+            "/quiz.import_questions", data=body, headers={"Content-Type": "text/csv"}
+        )
+        assert resp.status == 200
+        data = await resp.json()
+        assert data["data"]["inserted"] == 1
+        assert data["data"]["skipped"] == 1
+        assert data["data"]["errors"] == 1
+        assert data["data"]["error_lines"][0]["line"] == 4
+        assert await store.quiz.get_question_by_title("new question") is not None
+
+    async def test_csv_quoted_newline_and_long_line(self, authed_cli, store: Store):
+        body = (
+            "title,answer\n"
+            '"first line\nsecond line",answer\n'
+            f"{'x' * (MAX_LINE_SIZE + 1)},answer\n"
+            "last question,answer\n"
+        )
+        resp = await authed_cli.post(
+            "/quiz.import_questions", data=body, headers={"Content-Type": "text/csv"}
+        )
+        assert resp.status == 200
+        data = await resp.json()
+        assert data["data"]["inserted"] == 2
+        assert data["data"]["errors"] == 1
+        assert data["data"]["error_lines"][0]["line"] == 4
+        assert await store.quiz.get_question_by_title("first line\nsecond line") is not None
+        assert await store.quiz.get_question_by_title("last question") is not None
+
+    async def test_csv_stray_quote(self, authed_cli, store: Store):
+        body = (
+            "title,answer\n"
+            '12" record,answer\n'
+            "next question,answer\n"
+            '"quoted, with comma",answer\n'
+        )
+        resp = await authed_cli.post(
+            "/quiz.import_questions", data=body, headers={"Content-Type": "text/csv"}
+        )
+        assert resp.status == 200
+        data = await resp.json()
+        assert data["data"]["inserted"] == 3
+        assert data["data"]["errors"] == 0
+        assert await store.quiz.get_question_by_title('12" record') is not None
+        assert await store.quiz.get_question_by_title("next question") is not None
+
+    async def test_jsonl(self, authed_cli, store: Store):
+        body = "\n".join(
+            '{"title": "question %s", "answer": "%s"}' % (i, i) for i in range(1500)
+        )
+        resp = await authed_cli.post("/quiz.import_questions?format=jsonl", data=body)
+        assert resp.status == 200
+        data = await resp.json()
+        assert data["data"] == {
+            "inserted": 1500, "skipped": 0, "errors": 0, "error_lines": [],
+        }
+        assert len(await store.quiz.list_questions()) == 1500
@@ -0,0 +1,45 @@
+import pytest
+
+from src.app.bot.commands import CommandRouter, TEXT
+from src.app.bot.manager import router
+from src.app.store.tg_api.dataclasses import Message, parse_command
+
+
+class TestParseCommand:
+    @pytest.mark.parametrize(
+        "text, parsed",
+        [
+            ("/team_up", ("team_up", None)),
+            ("/start_game@cgkhost_bot now", ("start_game", "cgkhost_bot")),
+            ("team_up", (None, None)),
+            ("/", (None, None)),
+            (None, (None, None)),
+        ],
+    )
+    def test_parse(self, text, parsed):
+        assert parse_command(text) == parsed
+
+    def test_parsed_on_creation(self):
+        message = Message(message_id=1, text="/about@cgkhost_bot")
+        assert (message.command, message.command_to) == ("about", "cgkhost_bot")
+
+
+class TestCommandRouter:
+    def test_bot_routes(self):
+        assert router.resolve("off", "team_up").handler.__name__ == "team_up"
+        assert router.resolve("team_up", "team_up") is None
+        assert router.resolve("capitan", "about").handler.__name__ == "send_menu"
+        assert router.resolve("capitan", TEXT).handler.__name__ == "choose_responder"
+        # discussion only handles /end_game
+        assert router.resolve("discussion", "about") is None
+        assert router.resolve("discussion", "end_game").handler.__name__ == "end_game"
+
+    def test_duplicate_route(self):
+        command_router = CommandRouter()
+        command_router.route("about")(lambda: None)
+        with pytest.raises(ValueError):
+            command_router.route("about")(lambda: None)
+
+    def test_describe(self):
+        routes = {(route["state"], route["command"]) for route in router.describe()}
+        assert ("team_up", "start_game") in routes
@@ -0,0 +1,224 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.app.bot.cgk_config import CGKConfig, CGKEvent, CGKState
+from src.app.bot.manager import BotManager
+from src.app.bot.models import GameModel, PlayerModel
+from src.app.quiz.models import QuestionModel
+from src.app.store.cache.game_cache import GameCache
+from src.app.store.cache.stats_counter import StatsCounter
+from src.app.store.scheduler.clock import VirtualClock
+from src.app.store.scheduler.scheduler import DeadlineScheduler
+from src.app.store.tg_api.dataclasses import Chat, Message, Update, User
+from src.app.store.tg_api.dispatcher import UpdateDispatcher
+from src.app.store.tg_api.sender import TgApiError
+from src.app.web.config import BotConfig, CacheConfig
+
+cgk_config = CGKConfig()
+cgk_event = CGKEvent()
+cgk_state = CGKState()
+
+CHAT_ID = -1
+CAPITAN = PlayerModel(id=1, first_name="Alice")
+PLAYER = PlayerModel(id=2, first_name="Bob")
+QUESTION = QuestionModel(id=7, title="Question", answer="answer")
+
+
+class FakeDatabase:
+    @asynccontextmanager
+    async def unit_of_work(self):
+        yield None
+
+
+@pytest.fixture
+async def app():
+    """
+    Bot manager with game cache, scheduler on a virtual clock and real
+    dispatcher. Bot API, quiz and database are faked
+    """
+    app = SimpleNamespace(
+        config=SimpleNamespace(bot=BotConfig(token="1:token"), cache=CacheConfig()),
+        database=FakeDatabase(),
+        on_startup=[],
+        on_cleanup=[],
+    )
+    tg_api = AsyncMock()
+    tg_api.send_message.return_value = 1
+    tg_api.remove_buttons.return_value = 1
+    tg_api.send_choose_responder_buttons.return_value = 1
+    tg_api.get_team_players_models.return_value = [CAPITAN, PLAYER]
+    quiz = AsyncMock()
+    quiz.get_question_for_game.return_value = QUESTION
+    quiz.get_question_by_id.return_value = QUESTION
+    app.store = SimpleNamespace(tg_api=tg_api, quiz=quiz)
+    app.store.bot_manager = BotManager(app)
+    app.store.games = GameCache(app)
+    app.store.stats = StatsCounter(app)
+    app.store.scheduler = DeadlineScheduler(app)
+    app.store.scheduler.clock = VirtualClock(start=1000)
+    tg_api.dispatcher = UpdateDispatcher(app.store.bot_manager.handle_update, app.config.bot)
+
+    await tg_api.dispatcher.start()
+    await app.store.scheduler.connect(app)
+    yield app
+    await app.store.scheduler.disconnect(app)
+    await tg_api.dispatcher.stop()
+
+
+def make_game(status: str, **kwargs) -> GameModel:
+    values = dict(team=f"{CAPITAN.id} {PLAYER.id}", score_team=0, score_host=0)
+    return GameModel(id=CHAT_ID, status=status, **{**values, **kwargs})
+
+
+def make_update(user: PlayerModel, text: str) -> Update:
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            text=text,
+            chat=Chat(id=CHAT_ID, type="group"),
+            user=User(id=user.id, is_bot=False, first_name=user.first_name),
+        ),
+    )
+
+
+async def settle(app):
+    for _ in range(20):
+        await asyncio.sleep(0)
+    while app.store.tg_api.dispatcher.stats.pending:
+        await asyncio.sleep(0)
+
+
+async def fire_next(app) -> None:
+    """
+    Move virtual clock to the next deadline and handle it
+    """
+    app.store.scheduler.clock.advance_to(app.store.scheduler.next_at())
+    await settle(app)
+
+
+def sent_texts(app) -> list[str]:
+    return [call.args[1] for call in app.store.tg_api.send_message.await_args_list]
+
+
+class TestDeadlines:
+    async def test_discussion_to_capitan(self, app):
+        game = make_game(cgk_state.WAIT)
+        app.store.games.put(game)
+        await app.store.bot_manager.send_question(game)
+        assert game.status == cgk_state.DISCUSSION
+        assert game.deadline_event == cgk_event.DISCUSSION_WARNING
+        assert game.deadline == 1000 + cgk_config.TIME_LIMIT_DISC_MAIN
+
+        await fire_next(app)
+        assert sent_texts(app)[-1] == f"{cgk_config.TIME_LIMIT_DISC_EXTRA} seconds remaining"
+        assert game.deadline_event == cgk_event.DISCUSSION_END
+
+        await fire_next(app)
+        assert game.status == cgk_state.CAPITAN
+        assert game.deadline_event == cgk_event.CAPITAN_TIMEOUT
+        app.store.tg_api.send_choose_responder_buttons.assert_awaited_once()
+
+    async def test_capitan_timeout_penalty(self, app):
+        game = make_game(cgk_state.DISCUSSION)
+        app.store.games.put(game)
+        app.store.bot_manager.set_deadline(game, cgk_event.DISCUSSION_END, 0)
+        await settle(app)
+        assert game.status == cgk_state.CAPITAN
+
+        await fire_next(app)
+        assert game.score_host == 1
+        # next round started right away
+        assert game.status == cgk_state.DISCUSSION
+        assert game.deadline_event == cgk_event.DISCUSSION_WARNING
+
+    async def test_answer_timeout_penalty(self, app):
+        game = make_game(cgk_state.CAPITAN)
+        app.store.games.put(game)
+        await app.store.tg_api.dispatcher.dispatch(make_update(CAPITAN, PLAYER.first_name))
+        await settle(app)
+        assert game.status == cgk_state.ANSWER
+        assert game.responder_id == PLAYER.id
+        assert game.deadline == 1000 + cgk_config.TIME_LIMIT_ANSWER
+
+        await fire_next(app)
+        assert game.score_host == 1
+        assert app.store.stats.player_pending(PLAYER.id) == {"ans_late": 1}
+        assert any(text.startswith("Answer is late!") for text in sent_texts(app))
+
+    async def test_answer_in_time_cancels_deadline(self, app):
+        game = make_game(cgk_state.ANSWER, responder_id=PLAYER.id, last_question_id=QUESTION.id)
+        app.store.games.put(game)
+        app.store.bot_manager.set_deadline(game, cgk_event.ANSWER_TIMEOUT, 5)
+        await app.store.tg_api.dispatcher.dispatch(make_update(PLAYER, "Answer!"))
+        await settle(app)
+        assert game.score_team == 1
+        assert app.store.stats.player_pending(PLAYER.id) == {"ans_correct": 1}
+        # the deadline of the next round replaced the answer timeout
+        assert game.deadline_event == cgk_event.DISCUSSION_WARNING
+
+        app.store.scheduler.clock.advance(cgk_config.TIME_LIMIT_ANSWER)
+        await settle(app)
+        assert game.score_host == 0
+
+    async def test_outdated_deadline_skipped(self, app):
+        game = make_game(cgk_state.WAIT)
+        app.store.games.put(game)
+        app.store.scheduler.schedule(game.id, cgk_event.CAPITAN_TIMEOUT, 0)
+        await settle(app)
+        assert game.score_host == 0
+        app.store.tg_api.send_message.assert_not_awaited()
+
+    async def test_failed_send_keeps_deadline(self, app):
+        app.store.tg_api.send_choose_responder_buttons.side_effect = TgApiError(
+            "sendMessage", 500, "Internal Server Error"
+        )
+        game = make_game(cgk_state.DISCUSSION)
+        app.store.games.put(game)
+        app.store.bot_manager.set_deadline(game, cgk_event.DISCUSSION_END, 0)
+        await settle(app)
+        assert game.status == cgk_state.CAPITAN
+        assert app.store.scheduler.get_deadline(game.id).event == cgk_event.CAPITAN_TIMEOUT
+
+        await fire_next(app)
+        assert game.score_host == 1
+
+
+class TestRestoreGames:
+    async def test_overdue_deadline_fired(self, app):
+        game = make_game(
+            cgk_state.CAPITAN, deadline=900, deadline_event=cgk_event.CAPITAN_TIMEOUT
+        )
+        app.store.tg_api.get_active_games.return_value = [game]
+        await app.store.bot_manager.restore_games()
+        await settle(app)
+        assert app.store.games.peek(game.id) is game
+        assert game.score_host == 1
+        assert game.status == cgk_state.DISCUSSION
+
+    async def test_pending_deadline_rescheduled(self, app):
+        game = make_game(
+            cgk_state.ANSWER, responder_id=PLAYER.id,
+            deadline=1003, deadline_event=cgk_event.ANSWER_TIMEOUT,
+        )
+        app.store.tg_api.get_active_games.return_value = [game]
+        await app.store.bot_manager.restore_games()
+        await settle(app)
+        assert app.store.scheduler.next_at() == 1003
+        assert game.score_host == 0
+
+        await fire_next(app)
+        assert game.score_host == 1
+
+    async def test_game_without_deadline_resumed(self, app):
+        game = make_game(cgk_state.DISCUSSION, last_question_id=QUESTION.id)
+        app.store.tg_api.get_active_games.return_value = [game]
+        await app.store.bot_manager.restore_games()
+        await settle(app)
+        # discussion is cut short, capitan chooses the responder
+        assert game.status == cgk_state.CAPITAN
+        assert game.deadline_event == cgk_event.CAPITAN_TIMEOUT
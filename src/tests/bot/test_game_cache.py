@@ -0,0 +1,31 @@
+from sqlalchemy import select
+
+from src.app.bot.models import GameModel
+from src.app.store import Store
+
+
+class TestGameCache:
+    async def test_flush_dirty_games(self, cli, store: Store, db_session):
+        games = [GameModel(id=-chat_id, update_time=0) for chat_id in range(1, 4)]
+        async with db_session.begin() as session:
+            session.add_all(games)
+
+        for game in games:
+            game.status = "team_up"
+            game.score_team = game.id
+            store.games.mark_dirty(game)
+        await store.games.flush()
+
+        async with db_session() as session:
+            result = await session.scalars(select(GameModel).order_by(GameModel.id))
+            db_games = result.all()
+        assert [(g.id, g.status, g.score_team) for g in db_games] == [
+            (-3, "team_up", -3),
+            (-2, "team_up", -2),
+            (-1, "team_up", -1),
+        ]
+
+    async def test_cached_game_returned(self, cli, store: Store):
+        game = GameModel(id=-10, status="discussion")
+        store.games.put(game)
+        assert await store.games.get(-10) is game
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from sqlalchemy import inspect
+
+from src.app.bot.models import PlayerModel
+from src.app.store import Store
+from src.app.store.cache.player_cache import PlayerCache
+from src.app.store.tg_api.accessor import TgApiAccessor
+from src.app.web.config import CacheConfig
+
+
+def make_cache(**config) -> PlayerCache:
+    return PlayerCache(SimpleNamespace(config=SimpleNamespace(cache=CacheConfig(**config))))
+
+
+class TestPlayerCache:
+    def test_hit_returns_detached_copy(self):
+        cache = make_cache()
+        cache.put(PlayerModel(id=1, first_name="Alice", ans_correct=2))
+        first, second = cache.get(1), cache.get(1)
+        assert first is not second
+        assert (first.first_name, first.ans_correct) == ("Alice", 2)
+        assert inspect(first).detached
+        assert cache.get_stats() == {"size": 1, "hits": 2, "misses": 0}
+
+    def test_lru_eviction(self):
+        cache = make_cache(player_cache_size=2)
+        cache.put(PlayerModel(id=1))
+        cache.put(PlayerModel(id=2))
+        cache.get(1)
+        cache.put(PlayerModel(id=3))
+        assert cache.get(2) is None
+        assert cache.get(1) is not None and cache.get(3) is not None
+
+    def test_ttl_and_invalidate(self):
+        cache = make_cache(player_ttl=-1)
+        cache.put(PlayerModel(id=1))
+        assert cache.get(1) is None
+        assert len(cache) == 0
+
+        cache = make_cache()
+        cache.put(PlayerModel(id=1))
+        cache.invalidate(1)
+        assert cache.get(1) is None
+        assert cache.misses == 1
+
+    def test_fill_after_invalidate_dropped(self):
+        cache = make_cache()
+        version = cache.version
+        # row read before the flush committed
+        stale = PlayerModel(id=1, ans_correct=0)
+        cache.invalidate(1)
+        cache.put(stale, version)
+        assert cache.get(1) is None
+        cache.put(PlayerModel(id=1, ans_correct=1), cache.version)
+        assert cache.get(1).ans_correct == 1
+
+
+
+class TestCachedPlayerStats:
+    async def test_stats_flush_invalidates(
+            self, cli, store: Store, db_session, tg_api_accessor: TgApiAccessor
+    ):
+        async with db_session.begin() as session:
+            session.add(PlayerModel(id=1, first_name="Alice", ans_correct=0))
+
+        await tg_api_accessor.get_player_by_id(1)
+        hits = store.players.hits
+        assert (await tg_api_accessor.get_player_by_id(1)).ans_correct == 0
+        assert store.players.hits == hits + 1
+
+        store.stats.count_player(1, "ans_correct")
+        await store.stats.flush()
+        assert store.players.get(1) is None
+        assert (await tg_api_accessor.get_player_by_id(1)).ans_correct == 1
@@ -0,0 +1,39 @@
+import pytest
+
+from src.app.bot.models import GameModel
+from src.app.store import Store
+from src.app.store.quiz.sampler import permute
+
+
+@pytest.fixture
+async def quiz(server, store: Store):
+    yield store.quiz
+    # drop question ids cached by accessor, tables are truncated after test
+    await store.quiz.disconnect(server)
+
+
+class TestPermute:
+    @pytest.mark.parametrize("size", [1, 2, 5, 64, 1000])
+    def test_is_permutation(self, size):
+        for seed in (0, 1, 2**31 - 1):
+            assert sorted(permute(i, size, seed) for i in range(size)) == list(range(size))
+
+    def test_depends_on_seed(self):
+        assert [permute(i, 100, 1) for i in range(100)] != [permute(i, 100, 2) for i in range(100)]
+
+
+class TestQuestionForGame:
+    async def test_no_repeats_in_cycle(self, cli, quiz):
+        for i in range(10):
+            await quiz.create_question(f"question {i}", "answer")
+        game = GameModel(id=-1, q_cursor=0, q_cycle_size=0, q_seed=0)
+
+        first_cycle = [(await quiz.get_question_for_game(game)).id for _ in range(10)]
+        assert sorted(first_cycle) == list(range(1, 11))
+
+        second_cycle = [(await quiz.get_question_for_game(game)).id for _ in range(10)]
+        assert sorted(second_cycle) == list(range(1, 11))
+
+    async def test_empty_bank(self, cli, quiz):
+        game = GameModel(id=-1, q_cursor=0, q_cycle_size=0, q_seed=0)
+        assert await quiz.get_question_for_game(game) is None
@@ -0,0 +1,26 @@
+from src.app.bot.models import GameModel, PlayerModel
+from src.app.bot.roster import Roster
+
+
+class TestRoster:
+    def test_build(self):
+        game = GameModel(id=-1, team="2 1 3")
+        players = [
+            PlayerModel(id=1, first_name="Alice"),
+            PlayerModel(id=2, first_name="Bob"),
+            PlayerModel(id=3, first_name="Alice"),
+        ]
+        roster = Roster.build(game, players)
+        # team order, capitan first
+        assert roster.players == ((2, "Bob"), (1, "Alice"), (3, "Alice"))
+        assert roster.capitan_name == "Bob"
+        assert roster.by_name == {"Bob": 2, "Alice": 1}
+        assert roster.keyboard["keyboard"] == [
+            [{"text": "Bob"}, {"text": "Alice"}, {"text": "Alice"}]
+        ]
+        assert roster.capitan_mention[0]["user"] == {"id": 2}
+        assert roster.capitan_mention[0]["length"] == 3
+
+    def test_missing_player_skipped(self):
+        roster = Roster.build(GameModel(id=-1, team="1 2"), [PlayerModel(id=2, first_name="Bob")])
+        assert roster.players == ((2, "Bob"),)
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from sqlalchemy import select
+
+from src.app.bot.models import GameModel, PlayerModel
+from src.app.store import Store
+from src.app.store.cache.game_cache import GameCache
+from src.app.store.cache.stats_counter import StatsCounter
+
+
+class TestStatsCounter:
+    def test_pending_shown_in_stats(self):
+        stats = StatsCounter(SimpleNamespace(on_startup=[], on_cleanup=[]))
+        stats.count_game(-1, "wins")
+        stats.count_game(-1, "wins")
+        stats.count_player(1, "ans_late")
+        game = GameModel(id=-1, wins=1, loses=0, canceled=0)
+        assert "Wins: 3" in game.statistic(stats.game_pending(-1))
+        player = PlayerModel(id=1, ans_correct=0, ans_wrong=0, ans_late=0)
+        assert "Late answers: 1" in player.statistic(stats.player_pending(1))
+        assert stats.game_pending(-2) == {}
+
+    async def test_game_loaded_during_flush_reloaded(self):
+        app = SimpleNamespace(on_startup=[], on_cleanup=[])
+        stats = StatsCounter(app)
+        loads = [GameModel(id=-1, wins=1), GameModel(id=-1, wins=2)]
+
+        async def get_game_by_id(game_id):
+            # first read overlaps a flush
+            if len(loads) == 2:
+                stats.generation += 2
+            return loads.pop(0)
+
+        app.store = SimpleNamespace(
+            stats=stats, tg_api=AsyncMock(get_game_by_id=get_game_by_id)
+        )
+        games = GameCache(app)
+        assert (await games.get(-1)).wins == 2
+
+    async def test_flush_increments(self, cli, store: Store, db_session):
+        async with db_session.begin() as session:
+            session.add_all([
+                GameModel(id=-1, update_time=0, wins=2),
+                GameModel(id=-2, update_time=0),
+                PlayerModel(id=1, first_name="Alice", ans_correct=0, ans_wrong=0, ans_late=0),
+            ])
+
+        store.stats.count_game(-1, "wins")
+        store.stats.count_game(-2, "canceled")
+        store.stats.count_game(-2, "canceled")
+        store.stats.count_player(1, "ans_wrong")
+        await store.stats.flush()
+        assert store.stats.game_pending(-1) == {}
+
+        async with db_session() as session:
+            games = (await session.scalars(select(GameModel).order_by(GameModel.id))).all()
+            player = await session.get(PlayerModel, 1)
+        assert [(g.id, g.wins, g.canceled) for g in games] == [(-2, 0, 2), (-1, 3, 0)]
+        assert (player.ans_correct, player.ans_wrong) == (0, 1)
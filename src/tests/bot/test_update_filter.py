@@ -0,0 +1,59 @@
+from src.app.bot.models import GameModel
+from src.app.store import Store
+from src.app.store.tg_api.dataclasses import Chat, Message, Update, User
+
+CHAT_ID = -500
+
+
+def make_update(text: str, user_id: int = 1, chat_id: int = CHAT_ID) -> Update:
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            text=text,
+            chat=Chat(id=chat_id, type="group"),
+            user=User(id=user_id, is_bot=False, first_name="Alice"),
+        ),
+    )
+
+
+def cache_game(store: Store, status: str) -> GameModel:
+    game = GameModel(id=CHAT_ID, status=status, team="1 2 3", responder_id=2)
+    store.games.put(game)
+    return game
+
+
+class TestUpdateFilter:
+    def test_unknown_chat_passed(self, store: Store):
+        update_filter = store.bot_manager.update_filter
+        assert update_filter.drop_reason(make_update("hello", chat_id=-501)) is None
+
+    def test_chatter_dropped(self, store: Store):
+        update_filter = store.bot_manager.update_filter
+        cache_game(store, "off")
+        assert update_filter.drop_reason(make_update("hello")) == "not_command"
+        assert update_filter.drop_reason(make_update("/team_up@cgkhost_bot")) is None
+
+        cache_game(store, "discussion")
+        assert update_filter.drop_reason(make_update("/about")) == "discussion"
+        assert update_filter.drop_reason(make_update("/end_game")) is None
+
+    def test_only_capitan_and_responder_passed(self, store: Store):
+        update_filter = store.bot_manager.update_filter
+        cache_game(store, "capitan")
+        assert update_filter.drop_reason(make_update("Bob", user_id=1)) is None
+        assert update_filter.drop_reason(make_update("Bob", user_id=2)) == "not_capitan"
+
+        cache_game(store, "answer")
+        assert update_filter.drop_reason(make_update("answer", user_id=2)) is None
+        assert update_filter.drop_reason(make_update("answer", user_id=3)) == "not_responder"
+
+    def test_counters(self, store: Store):
+        update_filter = store.bot_manager.update_filter
+        cache_game(store, "team_up")
+        stats = update_filter.get_stats()
+        assert not update_filter.check(make_update("hello"))
+        assert update_filter.check(make_update("/start_game"))
+        new_stats = update_filter.get_stats()
+        assert new_stats["passed"] == stats["passed"] + 1
+        assert new_stats["dropped"]["not_command"] == stats["dropped"].get("not_command", 0) + 1
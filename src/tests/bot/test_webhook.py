@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from src.app.bot.views import SECRET_TOKEN_HEADER
+from src.app.store import Store
+from src.app.web.config import BotConfig, BotMode
+from src.tools.webhook_harness import read_updates
+
+RECORDED_UPDATES = Path(__file__).parent.parent / "fixtures" / "updates.jsonl"
+
+
+@pytest.fixture
+def handle_raw_update(store: Store):
+    store.tg_api.handle_raw_update.reset_mock()
+    return store.tg_api.handle_raw_update
+
+
+class TestWebhookView:
+    async def test_recorded_updates(self, cli, config, handle_raw_update):
+        updates = read_updates(str(RECORDED_UPDATES))
+        for update in updates:
+            resp = await cli.post(
+                "/bot.webhook",
+                json=update,
+                headers={SECRET_TOKEN_HEADER: config.bot.webhook_secret},
+            )
+            assert resp.status == 200
+        assert [call.args[0] for call in handle_raw_update.await_args_list] == updates
+
+    async def test_wrong_secret(self, cli, handle_raw_update):
+        resp = await cli.post(
+            "/bot.webhook",
+            json={"update_id": 1},
+            headers={SECRET_TOKEN_HEADER: "wrong"},
+        )
+        assert resp.status == 401
+        data = await resp.json()
+        assert data["status"] == "unauthorized"
+        handle_raw_update.assert_not_awaited()
+
+    async def test_non_ascii_secret(self, cli, handle_raw_update):
+        resp = await cli.post(
+            "/bot.webhook", json={"update_id": 1}, headers={SECRET_TOKEN_HEADER: "секрет"}
+        )
+        assert resp.status == 401
+        handle_raw_update.assert_not_awaited()
+
+    async def test_secret_not_configured(self, cli, config, monkeypatch, handle_raw_update):
+        monkeypatch.setattr(config.bot, "webhook_secret", None)
+        resp = await cli.post("/bot.webhook", json={"update_id": 1})
+        assert resp.status == 401
+        handle_raw_update.assert_not_awaited()
+
+    def test_webhook_mode_requires_secret(self):
+        with pytest.raises(ValueError):
+            BotConfig(token="token", mode=BotMode.WEBHOOK, webhook_url="https://localhost/bot.webhook")
+
+    async def test_not_an_update(self, cli, config, handle_raw_update):
+        resp = await cli.post(
+            "/bot.webhook",
+            json={"message": {}},
+            headers={SECRET_TOKEN_HEADER: config.bot.webhook_secret},
+        )
+        assert resp.status == 400
+        handle_raw_update.assert_not_awaited()
@@ -1,2 +1,3 @@
 from .common import *
 from .quiz import *
+from .tg_api import *
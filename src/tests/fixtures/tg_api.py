@@ -0,0 +1,43 @@
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+from src.app.store.tg_api.accessor import TgApiAccessor
+from src.app.store.tg_api.checkpoint import UpdateCheckpoint
+from src.app.store.tg_api.sender import Sender
+from src.tools.fake_tg_api import FakeTgApi
+
+
+@pytest.fixture
+async def fake_tg_api(config) -> FakeTgApi:
+    fake = FakeTgApi(token=config.bot.token)
+    await fake.start()
+    yield fake
+    await fake.stop()
+
+
+@pytest.fixture
+async def tg_api_accessor(server, fake_tg_api: FakeTgApi) -> TgApiAccessor:
+    """
+    Real accessor pointed at fake Bot API. Runs outside of test app, which
+    has tg_api mocked
+    """
+    app = SimpleNamespace(
+        config=replace(
+            server.config,
+            bot=replace(server.config.bot, api_url=fake_tg_api.url, chat_rate_limit=100),
+        ),
+        store=server.store,
+        database=server.database,
+        on_startup=[],
+        on_cleanup=[],
+    )
+    accessor = TgApiAccessor(app)
+    accessor.session = accessor.create_session()
+    # not started, offset is not saved
+    accessor.checkpoint = UpdateCheckpoint(app.database, app.config.bot, accessor.bot_id)
+    accessor.sender = Sender(accessor, app.config.bot)
+    await accessor.sender.start()
+    yield accessor
+    await accessor.sender.stop()
+    await accessor.session.close()
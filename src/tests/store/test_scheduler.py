@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.app.store.scheduler.clock import VirtualClock
+from src.app.store.scheduler.scheduler import DeadlineScheduler
+
+
+def make_scheduler(fired: list) -> DeadlineScheduler:
+    dispatcher = SimpleNamespace(
+        submit_nowait=lambda chat_id, handler, deadline: fired.append(deadline)
+    )
+    app = SimpleNamespace(
+        store=SimpleNamespace(
+            tg_api=SimpleNamespace(dispatcher=dispatcher),
+            bot_manager=SimpleNamespace(handle_deadline=None),
+        ),
+        on_startup=[],
+        on_cleanup=[],
+    )
+    scheduler = DeadlineScheduler(app)
+    scheduler.clock = VirtualClock(start=1000)
+    return scheduler
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestVirtualClock:
+    async def test_fires_on_advance(self):
+        fired = []
+        scheduler = make_scheduler(fired)
+        await scheduler.connect(scheduler.app)
+        try:
+            scheduler.schedule(1, "warning", 5)
+            scheduler.schedule(2, "warning", 10)
+            await settle()
+            assert fired == []
+
+            scheduler.clock.advance_to(scheduler.next_at())
+            await settle()
+            assert [d.game_id for d in fired] == [1]
+            assert scheduler.next_at() == 1010
+
+            scheduler.clock.advance(100)
+            await settle()
+            assert [d.game_id for d in fired] == [1, 2]
+            assert scheduler.next_at() is None
+        finally:
+            await scheduler.disconnect(scheduler.app)
+
+    async def test_next_at_skips_cancelled(self):
+        scheduler = make_scheduler([])
+        scheduler.schedule(1, "warning", 5)
+        scheduler.schedule(2, "warning", 10)
+        scheduler.cancel(1)
+        assert scheduler.next_at() == 1010
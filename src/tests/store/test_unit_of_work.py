@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import func, select
+
+from src.app.quiz.models import QuestionModel
+from src.app.store import Store
+from src.app.store.database.database import current_session
+
+
+async def count_questions(db_session) -> int:
+    async with db_session() as session:
+        return await session.scalar(select(func.count(QuestionModel.id)))
+
+
+class TestUnitOfWork:
+    async def test_accessors_share_session(self, cli, store: Store, db_session):
+        async with cli.app.database.unit_of_work() as session:
+            await store.quiz.create_question("title 1", "answer")
+            await store.quiz.create_question("title 2", "answer")
+            assert current_session.get() is session
+            # nothing is committed before unit of work ends
+            assert await count_questions(db_session) == 0
+        assert current_session.get() is None
+        assert await count_questions(db_session) == 2
+
+    async def test_rollback_on_error(self, cli, store: Store, db_session):
+        with pytest.raises(RuntimeError):
+            async with cli.app.database.unit_of_work():
+                await store.quiz.create_question("title", "answer")
+                raise RuntimeError
+        assert await count_questions(db_session) == 0
+
+    async def test_accessor_without_unit_of_work(self, cli, store: Store, db_session):
+        await store.quiz.create_question("title", "answer")
+        assert await count_questions(db_session) == 1
+
+    async def test_release_commits_and_continues(self, cli, store: Store, db_session):
+        async with cli.app.database.unit_of_work() as session:
+            await store.quiz.create_question("title 1", "answer")
+            await cli.app.database.release()
+            assert not session.in_transaction()
+            assert await count_questions(db_session) == 1
+            await store.quiz.create_question("title 2", "answer")
+            assert current_session.get() is session
+        assert await count_questions(db_session) == 2
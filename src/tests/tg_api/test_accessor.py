@@ -0,0 +1,146 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.app.bot.models import GameModel
+from src.app.store.tg_api.accessor import TgApiAccessor
+from src.app.store.tg_api.poller import Poller
+from src.app.store.tg_api.sender import TgApiError
+from src.tools.fake_tg_api import FakeTgApi
+
+
+def group_message(text: str) -> dict:
+    return {
+        "message": {
+            "message_id": 1, "date": 1, "text": text,
+            "chat": {"id": -1, "type": "group", "title": "cgk"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Alice"},
+        },
+    }
+
+
+class FakeDispatcher:
+    def __init__(self):
+        self.handled = []
+
+    async def dispatch(self, update):
+        self.handled.append(update)
+
+    async def wait_accepting(self):
+        pass
+
+
+class TestTgApiAccessor:
+    async def test_send_message(self, tg_api_accessor: TgApiAccessor, fake_tg_api: FakeTgApi):
+        date = await tg_api_accessor.send_message(-1, "hello")
+        assert isinstance(date, int)
+        [call] = fake_tg_api.calls_of("sendMessage")
+        assert call.params["text"] == "hello"
+        assert int(call.params["chat_id"]) == -1
+
+    async def test_remove_buttons(self, tg_api_accessor: TgApiAccessor, fake_tg_api: FakeTgApi):
+        await tg_api_accessor.remove_buttons(GameModel(id=-1), "bye")
+        [call] = fake_tg_api.calls_of("sendMessage")
+        assert call.params["reply_markup"] == {"remove_keyboard": True}
+
+    async def test_json_body(self, tg_api_accessor: TgApiAccessor, fake_tg_api: FakeTgApi):
+        await tg_api_accessor.answer_cq(SimpleNamespace(id="1"), "ok")
+        [call] = fake_tg_api.calls_of("answerCallbackQuery")
+        # typed values, not query string
+        assert call.params == {"callback_query_id": "1", "text": "ok", "show_alert": False}
+
+    async def test_retry_after(self, tg_api_accessor: TgApiAccessor, fake_tg_api: FakeTgApi):
+        fake_tg_api.inject_error("sendMessage", 429, "Too Many Requests", retry_after=0)
+        await tg_api_accessor.send_message(-1, "hello")
+        assert len(fake_tg_api.calls_of("sendMessage")) == 2
+
+    async def test_error(self, tg_api_accessor: TgApiAccessor, fake_tg_api: FakeTgApi):
+        fake_tg_api.inject_error("sendMessage", 400, "Bad Request: chat not found")
+        with pytest.raises(TgApiError):
+            await tg_api_accessor.send_message(-1, "hello")
+
+    async def test_poll(self, tg_api_accessor: TgApiAccessor, fake_tg_api: FakeTgApi):
+        tg_api_accessor.dispatcher = FakeDispatcher()
+        fake_tg_api.push_update(group_message("/about"))
+        await tg_api_accessor.poll()
+        assert [update.message.text for update in tg_api_accessor.dispatcher.handled] == ["/about"]
+        assert tg_api_accessor.offset == 2
+
+    async def test_undecodable_update_done(self, tg_api_accessor: TgApiAccessor):
+        tg_api_accessor.dispatcher = FakeDispatcher()
+        raw_update = {
+            "update_id": 5,
+            # message of inaccessible callback query has no "from"
+            "callback_query": {
+                "id": "500", "data": "join",
+                "from": {"id": 2, "is_bot": False, "first_name": "Bob"},
+                "message": {"message_id": 1, "date": 0, "chat": {"id": -1, "type": "group"}},
+            },
+        }
+        with pytest.raises(KeyError):
+            await tg_api_accessor.handle_raw_update(raw_update)
+        assert tg_api_accessor.checkpoint.watermark == 5
+
+
+class TestPoller:
+    async def test_pipeline(self, tg_api_accessor: TgApiAccessor, fake_tg_api: FakeTgApi):
+        tg_api_accessor.app.config.bot.poll_limit = 2
+        tg_api_accessor.dispatcher = dispatcher = FakeDispatcher()
+        poller = Poller(SimpleNamespace(tg_api=tg_api_accessor))
+        for text in ("/about", "/rules", "/team_up"):
+            fake_tg_api.push_update(group_message(text))
+
+        await poller.start()
+        for _ in range(100):
+            if len(dispatcher.handled) == 3:
+                break
+            await asyncio.sleep(0.01)
+        # stop interrupts the pending long poll
+        await asyncio.wait_for(poller.stop(), 1)
+
+        assert [update.message.text for update in dispatcher.handled] == [
+            "/about", "/rules", "/team_up"
+        ]
+        assert tg_api_accessor.offset == 4
+        calls = fake_tg_api.calls_of("getUpdates")
+        assert {int(call.params["limit"]) for call in calls} == {2}
+        assert len(calls) >= 3
+
+    async def test_failed_update_skipped_alone(
+            self, tg_api_accessor: TgApiAccessor, fake_tg_api: FakeTgApi
+    ):
+        tg_api_accessor.dispatcher = dispatcher = FakeDispatcher()
+        poller = Poller(SimpleNamespace(tg_api=tg_api_accessor))
+        fake_tg_api.push_update(group_message("/about"))
+        # message without "from" fails to decode
+        fake_tg_api.push_update({"message": {"message_id": 2, "date": 1, "chat": {"id": -1}}})
+        fake_tg_api.push_update(group_message("/rules"))
+
+        await poller.start()
+        for _ in range(100):
+            if len(dispatcher.handled) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(poller.stop(), 1)
+        assert [update.message.text for update in dispatcher.handled] == ["/about", "/rules"]
+
+
+class TestDictToDc:
+    def test_callback_query(self):
+        raw_update = {
+            "update_id": 7,
+            "callback_query": {
+                "id": "500", "data": "join",
+                "from": {"id": 2, "is_bot": False, "first_name": "Bob"},
+                "message": group_message("Press the button")["message"],
+            },
+        }
+        update = TgApiAccessor.dict_to_dc(raw_update)
+        assert update.update_id == 7
+        assert update.callback_query.user.first_name == "Bob"
+        assert update.callback_query.message.chat.id == -1
+        assert not hasattr(update, "__dict__")
+
+    def test_unknown_update(self):
+        assert TgApiAccessor.dict_to_dc({"update_id": 7, "poll": {}}) is None
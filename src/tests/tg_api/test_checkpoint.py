@@ -0,0 +1,58 @@
+from dataclasses import replace
+
+from src.app.store.tg_api.checkpoint import UpdateCheckpoint
+
+
+def make_checkpoint(config, saved=None, **bot_config) -> UpdateCheckpoint:
+    checkpoint = UpdateCheckpoint(
+        database=None, config=replace(config.bot, **bot_config), bot_id=0
+    )
+    checkpoint.saved = checkpoint._received = saved
+    return checkpoint
+
+
+class TestUpdateCheckpoint:
+    def test_watermark_waits_for_slowest_update(self, config):
+        checkpoint = make_checkpoint(config)
+        assert checkpoint.watermark is None
+        for update_id in (10, 11, 12):
+            assert checkpoint.accept(update_id)
+        checkpoint.done(11)
+        checkpoint.done(12)
+        assert checkpoint.watermark == 9
+        checkpoint.done(10)
+        assert checkpoint.watermark == 12
+
+    def test_duplicates_dropped(self, config):
+        checkpoint = make_checkpoint(config, saved=5)
+        assert not checkpoint.accept(5)
+        assert checkpoint.accept(6)
+        assert not checkpoint.accept(6)
+        checkpoint.done(6)
+        assert not checkpoint.accept(6)
+        assert checkpoint.duplicates == 3
+
+    def test_ring_is_bounded(self, config):
+        checkpoint = make_checkpoint(config, seen_updates_size=2)
+        for update_id in (1, 2, 3):
+            checkpoint.accept(update_id)
+        assert len(checkpoint._seen) == 2
+        assert not checkpoint.accept(3)
+
+    def test_update_id_reset(self, config):
+        checkpoint = make_checkpoint(config, saved=500000, seen_updates_size=1000)
+        assert not checkpoint.accept(499500)
+        assert checkpoint.accept(10)
+        assert not checkpoint.accept(10)
+        assert checkpoint.accept(11)
+        checkpoint.done(10)
+        checkpoint.done(11)
+        assert checkpoint.watermark == 11
+        assert checkpoint.saved is None
+
+    def test_update_id_reset_after_few_updates(self, config):
+        checkpoint = make_checkpoint(config, saved=50000)
+        assert checkpoint.accept(50001)
+        for update_id in (10, 11, 12):
+            assert checkpoint.accept(update_id)
+        assert checkpoint.watermark == 9
@@ -0,0 +1,85 @@
+import asyncio
+
+from src.app.store.tg_api.dataclasses import Chat, Message, Update
+from src.app.store.tg_api.dispatcher import UpdateDispatcher
+from src.app.web.config import BotConfig
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(message_id=update_id, chat=Chat(id=chat_id, type="group")),
+    )
+
+
+class TestUpdateDispatcher:
+    async def test_chat_order_and_backpressure(self):
+        handled = []
+
+        async def handler(update: Update):
+            await asyncio.sleep(0.001 * (update.update_id % 3))
+            handled.append(update)
+
+        dispatcher = UpdateDispatcher(
+            handler,
+            BotConfig(
+                token="token",
+                dispatcher_workers=3,
+                chat_queue_size=2,
+                max_pending_updates=4,
+            ),
+        )
+        await dispatcher.start()
+        for update_id in range(30):
+            await dispatcher.wait_accepting()
+            await dispatcher.dispatch(make_update(update_id, update_id % 4))
+        while dispatcher.stats.pending:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+
+        for chat_id in range(4):
+            ids = [u.update_id for u in handled if u.message.chat.id == chat_id]
+            assert ids == sorted(ids)
+        stats = dispatcher.get_stats()
+        assert stats["processed"] == 30
+        assert stats["max_pending"] <= 4
+        assert stats["max_chat_depth"] <= 2
+        assert stats["paused"] > 0
+
+    async def test_stop_drains_queues(self):
+        handled = []
+
+        async def handler(update: Update):
+            await asyncio.sleep(0.01)
+            handled.append(update.update_id)
+
+        dispatcher = UpdateDispatcher(handler, BotConfig(token="token", dispatcher_workers=2))
+        await dispatcher.start()
+        for update_id in range(6):
+            await dispatcher.dispatch(make_update(update_id, update_id % 2))
+        await dispatcher.stop()
+        assert sorted(handled) == list(range(6))
+
+    async def test_stop_timeout(self):
+        async def handler(update: Update):
+            await asyncio.sleep(10)
+
+        dispatcher = UpdateDispatcher(
+            handler, BotConfig(token="token", dispatcher_stop_timeout=0.01)
+        )
+        await dispatcher.start()
+        await dispatcher.dispatch(make_update(1, 1))
+        await asyncio.wait_for(dispatcher.stop(), 1)
+        assert dispatcher.stats.processed == 0
+
+    async def test_failed_handler_counted(self):
+        async def handler(update: Update):
+            raise ValueError
+
+        dispatcher = UpdateDispatcher(handler, BotConfig(token="token"))
+        await dispatcher.start()
+        await dispatcher.dispatch(make_update(1, 1))
+        await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        assert dispatcher.stats.failed == 1
+        assert dispatcher.get_stats()["chats"] == 0
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from src.app.store.tg_api.accessor import TgApiAccessor
+from src.app.store.tg_api.recorder import UpdateRecorder, read_capture
+from src.tools.webhook_harness import read_updates
+
+UPDATES = read_updates(str(Path(__file__).parent.parent / "fixtures" / "updates.jsonl"))
+
+
+class TestUpdateRecorder:
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "updates.jsonl.gz")
+        recorder = UpdateRecorder(path)
+        recorder.open()
+        recorder.write(UPDATES[:2])
+        recorder.write([])
+        recorder.close()
+        # next run appends to the same capture
+        recorder.open()
+        recorder.write(UPDATES[2:])
+        recorder.close()
+
+        batches = list(read_capture(path))
+        assert [updates for _, updates in batches] == [UPDATES[:2], UPDATES[2:]]
+        assert batches[0][0] <= batches[1][0]
+
+
+class TestAccepts:
+    def test_private_and_textless_messages_skipped(self):
+        message = UPDATES[0]["message"]
+        assert TgApiAccessor.accepts(UPDATES[0])
+        assert TgApiAccessor.accepts(UPDATES[1])
+        assert not TgApiAccessor.accepts(
+            {"message": {**message, "chat": {"id": 1, "type": "private"}}}
+        )
+        assert not TgApiAccessor.accepts({"message": {**message, "text": ""}})
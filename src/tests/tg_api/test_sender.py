@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientConnectionError
+
+from src.app.store.tg_api.sender import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Sender,
+    SendPriority,
+    TgApiError,
+    backoff_delay,
+)
+from src.app.web.config import BotConfig
+
+
+class FakeTgApi:
+    def __init__(self, responses: dict = None):
+        self.calls = []
+        self.responses = responses or {}
+
+    async def call(self, method: str, params: dict) -> dict:
+        self.calls.append((method, params))
+        responses = self.responses.get(params.get("text"))
+        if responses:
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return {"ok": True, "result": {"date": len(self.calls)}}
+
+
+@pytest.fixture
+async def sender():
+    tg_api = FakeTgApi()
+    sender = Sender(
+        tg_api,
+        BotConfig(
+            token="token",
+            chat_rate_limit=50,
+            chat_burst=1,
+            global_burst=1,
+            retry_base_delay=0.01,
+            breaker_failure_threshold=2,
+        ),
+    )
+    await sender.start()
+    yield sender
+    await sender.stop()
+
+
+class TestSender:
+    async def test_result_returned(self, sender: Sender):
+        result = await sender.submit("sendMessage", {"text": "hi"}, chat_id=1)
+        assert result == {"date": 1}
+
+    async def test_chat_order_kept(self, sender: Sender):
+        futures = [
+            sender.submit("sendMessage", {"text": str(i)}, chat_id=1) for i in range(5)
+        ]
+        await asyncio.gather(*futures)
+        assert [params["text"] for _, params in sender.tg_api.calls] == list("01234")
+
+    async def test_callback_lane_first(self, sender: Sender):
+        futures = [
+            sender.submit("sendMessage", {"text": "msg"}, chat_id=1),
+            sender.submit("sendMessage", {"text": "msg"}, chat_id=2),
+            sender.submit("answerCallbackQuery", {"text": "cb"}, priority=SendPriority.CALLBACK),
+        ]
+        await asyncio.gather(*futures)
+        assert sender.tg_api.calls[0][0] == "answerCallbackQuery"
+
+    async def test_retry_after_honoured(self, sender: Sender):
+        sender.tg_api.responses["flood"] = [
+            {"ok": False, "error_code": 429, "parameters": {"retry_after": 0.1}},
+        ]
+        result = await sender.submit("sendMessage", {"text": "flood"}, chat_id=1)
+        assert result == {"date": 2}
+        assert len(sender.tg_api.calls) == 2
+
+    async def test_error_raised(self, sender: Sender):
+        sender.tg_api.responses["bad"] = [
+            {"ok": False, "error_code": 400, "description": "Bad Request"},
+        ]
+        with pytest.raises(TgApiError) as exc_info:
+            await sender.submit("sendMessage", {"text": "bad"}, chat_id=1)
+        assert exc_info.value.error_code == 400
+
+    async def test_server_error_retried(self, sender: Sender):
+        sender.tg_api.responses["flaky"] = [
+            ClientConnectionError(),
+            {"ok": False, "error_code": 502, "description": "Bad Gateway"},
+        ]
+        result = await sender.submit("sendMessage", {"text": "flaky"}, chat_id=1)
+        assert result == {"date": 3}
+        assert sender.get_stats()["retries"] == 2
+        assert sender.breaker.failures == 0
+
+    async def test_non_critical_shed(self, sender: Sender):
+        sender.tg_api.responses["down"] = [
+            {"ok": False, "error_code": 500, "description": "Internal Server Error"},
+        ] * 4
+        with pytest.raises(TgApiError):
+            await sender.submit("sendMessage", {"text": "down"}, chat_id=1)
+
+        with pytest.raises(CircuitOpenError):
+            await sender.submit("sendMessage", {"text": "menu"}, chat_id=1, critical=False)
+        assert sender.get_stats()["shed"] == 1
+        # critical requests still go through and close the breaker
+        await sender.submit("sendMessage", {"text": "question"}, chat_id=1)
+        await sender.submit("sendMessage", {"text": "menu"}, chat_id=1, critical=False)
+        assert len(sender.tg_api.calls) == 6
+
+
+class TestCircuitBreaker:
+    def test_open_and_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        breaker.record_failure(0)
+        assert breaker.state(0) == CircuitBreaker.CLOSED
+        breaker.record_failure(1)
+        assert breaker.state(1) == CircuitBreaker.OPEN
+        assert not breaker.allows(critical=False)
+        assert breaker.allows(critical=True)
+        assert breaker.state(11) == CircuitBreaker.HALF_OPEN
+        # failed probe opens it again
+        breaker.record_failure(11)
+        assert breaker.state(12) == CircuitBreaker.OPEN
+        breaker.record_success()
+        assert breaker.state(12) == CircuitBreaker.CLOSED
+
+
+def test_backoff_delay():
+    for attempt in range(1, 10):
+        assert 0 <= backoff_delay(attempt, 0.5, 4) <= min(4, 0.5 * 2 ** (attempt - 1))
@@ -0,0 +1,114 @@
+"""
+Microbenchmark of update decoding: JSON body to Update objects.
+
+Usage:
+    python -m src.tools.decode_benchmark [updates.jsonl | capture.jsonl.gz] \
+        --repeat 1000 --output decode.json
+
+Raw updates are packed into getUpdates response bodies and decoded with
+every available JSON decoder, then turned into Update objects with
+`TgApiAccessor.dict_to_dc`. Reports time and memory blocks/bytes kept
+alive per update. Defaults to recorded updates from test fixtures.
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from src.app.store.tg_api.accessor import TgApiAccessor
+from src.app.store.tg_api.decoding import orjson
+from src.app.store.tg_api.recorder import read_capture
+from src.tools.webhook_harness import read_updates
+
+FIXTURE = Path(__file__).parent.parent / "tests" / "fixtures" / "updates.jsonl"
+BATCH_SIZE = 100
+
+
+def load_updates(path: str) -> list[dict]:
+    if path.endswith(".gz"):
+        return [update for _, updates in read_capture(path) for update in updates]
+    return read_updates(path)
+
+
+def make_bodies(updates: list[dict], repeat: int) -> list[str]:
+    """
+    getUpdates response bodies holding `repeat` copies of updates
+    """
+    stream = updates * repeat
+    return [
+        json.dumps({"ok": True, "result": stream[i:i + BATCH_SIZE]})
+        for i in range(0, len(stream), BATCH_SIZE)
+    ]
+
+
+def decode(bodies: list[str], loads: Callable, build: bool) -> list:
+    decoded = []
+    for body in bodies:
+        for raw_update in loads(body)["result"]:
+            if build:
+                if TgApiAccessor.accepts(raw_update):
+                    decoded.append(TgApiAccessor.dict_to_dc(raw_update))
+            else:
+                decoded.append(raw_update)
+    return decoded
+
+
+def measure(bodies: list[str], count: int, loads: Callable, build: bool) -> dict:
+    decode(bodies, loads, build)  # warm up
+
+    gc.collect()
+    started = time.perf_counter()
+    decode(bodies, loads, build)
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    decoded = decode(bodies, loads, build)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    del decoded
+    return {
+        "us_per_update": elapsed / count * 1e6,
+        "blocks_per_update": sum(stat.count_diff for stat in stats) / count,
+        "bytes_per_update": sum(stat.size_diff for stat in stats) / count,
+    }
+
+
+def run(path: str, repeat: int) -> dict:
+    updates = load_updates(path)
+    bodies = make_bodies(updates, repeat)
+    count = len(updates) * repeat
+    decoders = {"json": json.loads}
+    if orjson is not None:
+        decoders["orjson"] = orjson.loads
+
+    result = {"updates": count, "source": path}
+    for name, loads in decoders.items():
+        result[name] = {
+            "json_only": measure(bodies, count, loads, build=False),
+            "to_update": measure(bodies, count, loads, build=True),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", nargs="?", default=str(FIXTURE))
+    parser.add_argument("--repeat", type=int, default=1000, help="Copies of every update")
+    parser.add_argument("--output", default=None, help="Save results to JSON file")
+    args = parser.parse_args()
+
+    output = json.dumps(run(args.path, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+In-process stand-in for Telegram Bot API, for integration and load tests.
+
+Implements getUpdates, sendMessage, answerCallbackQuery, setMyCommands and
+the webhook/commands service methods the bot calls on startup. Latency
+and error responses can be scripted per method, every call is recorded.
+Point `bot.api_url` config at `FakeTgApi.url` to use it, or use
+`FakeTgApi.call` as an in-process transport instead of HTTP.
+"""
+import asyncio
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from aiohttp import web
+
+BOT_ID = 1000
+
+
+@dataclass
+class RecordedCall:
+    method: str
+    params: dict
+    time: float
+
+
+@dataclass
+class InjectedError:
+    status: int
+    description: str
+    retry_after: Optional[int] = None
+
+
+@dataclass
+class FakeTgApi:
+    token: str = "fake_token"
+    host: str = "127.0.0.1"
+    port: int = 0
+    # seconds, per method name, "*" applies to all methods
+    latency: dict = field(default_factory=dict)
+    calls: list = field(default_factory=list)
+    # update ids keep growing across runs against the same database,
+    # where the bot saves the last handled update_id
+    first_update_id: int = 1
+    # source of message dates, e.g. VirtualClock.time
+    clock: Callable[[], float] = time.time
+
+    def __post_init__(self):
+        self._updates: deque[dict] = deque()
+        self._new_updates = asyncio.Event()
+        self._long_polls = 0
+        self._errors: dict[str, deque[InjectedError]] = {}
+        self._update_id = itertools.count(self.first_update_id)
+        self._message_id = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self.app = web.Application()
+        self.app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        self.methods = {
+            "getUpdates": self.get_updates,
+            "sendMessage": self.send_message,
+            "answerCallbackQuery": self.ok,
+            "setMyCommands": self.ok,
+            "deleteMyCommands": self.ok,
+            "setWebhook": self.ok,
+            "deleteWebhook": self.ok,
+        }
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self.url
+
+    async def stop(self):
+        # release pending long polls
+        self._new_updates.set()
+        while self._long_polls:
+            await asyncio.sleep(0)
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def url(self) -> str:
+        """
+        Value for `bot.api_url` config
+        """
+        return f"http://{self.host}:{self.port}"
+
+    def push_update(self, raw_update: dict) -> dict:
+        """
+        Queue update for getUpdates. update_id is assigned if missing
+        :param raw_update: Raw update without or with update_id
+        :return: Queued update
+        """
+        raw_update.setdefault("update_id", next(self._update_id))
+        self._updates.append(raw_update)
+        self._new_updates.set()
+        return raw_update
+
+    def inject_error(
+            self,
+            method: str,
+            status: int = 500,
+            description: str = "Internal Server Error",
+            retry_after: Optional[int] = None,
+            times: int = 1,
+    ) -> None:
+        """
+        Make next `times` calls of method fail
+        :param method: Bot API method name
+        :param status: HTTP status and error_code, e.g. 429 or 502
+        :param description: Error description
+        :param retry_after: retry_after parameter for 429 responses
+        :param times: Number of failing calls
+        :return:
+        """
+        errors = self._errors.setdefault(method, deque())
+        errors.extend(InjectedError(status, description, retry_after) for _ in range(times))
+
+    def calls_of(self, method: str) -> list[RecordedCall]:
+        return [call for call in self.calls if call.method == method]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if request.match_info["token"] != self.token:
+            return web.json_response(self.error(401, "Unauthorized"), status=401)
+        data = await self.call(request.match_info["method"], await self.read_params(request))
+        return web.json_response(data, status=data.get("error_code", 200))
+
+    async def call(self, method: str, params: dict) -> dict:
+        """
+        Handle Bot API call without HTTP, same signature as TgApiAccessor.call
+        :param method: Bot API method name
+        :param params: Method parameters
+        :return: Bot API response body
+        """
+        self.calls.append(RecordedCall(method, params, self.clock()))
+
+        delay = self.latency.get(method, self.latency.get("*", 0))
+        if delay:
+            await asyncio.sleep(delay)
+
+        errors = self._errors.get(method)
+        if errors:
+            error = errors.popleft()
+            return self.error(error.status, error.description, error.retry_after)
+
+        handler = self.methods.get(method)
+        if handler is None:
+            return self.error(404, "Not Found: method not found")
+        return {"ok": True, "result": await handler(params)}
+
+    @staticmethod
+    async def read_params(request: web.Request) -> dict:
+        params = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+        return params
+
+    @staticmethod
+    def error(status: int, description: str, retry_after: Optional[int] = None) -> dict:
+        data = {"ok": False, "error_code": status, "description": description}
+        if retry_after is not None:
+            data["parameters"] = {"retry_after": retry_after}
+        return data
+
+    async def ok(self, params: dict) -> bool:
+        return True
+
+    async def get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        # updates below offset are confirmed
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            self._long_polls += 1
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._long_polls -= 1
+        return list(itertools.islice(self._updates, limit))
+
+    async def send_message(self, params: dict) -> dict:
+        chat_id = int(params["chat_id"])
+        return {
+            "message_id": next(self._message_id),
+            "date": int(self.clock()),
+            "text": params.get("text"),
+            "chat": {"id": chat_id, "type": "group" if chat_id < 0 else "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "cgkhost"},
+        }
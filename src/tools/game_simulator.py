@@ -0,0 +1,152 @@
+"""
+Deterministic game simulator running on a virtual clock.
+
+Usage:
+    python -m src.tools.game_simulator --config src/env/dev.env.yaml \
+        --chats 100 --games 10 --late-rate 0.1 --seed 1 --output sim.json
+
+Same simulated chats as the load generator, but game deadlines use
+VirtualClock: once every update and outbound call is handled, the clock
+jumps to the next deadline instead of sleeping. Bot API calls go to
+FakeTgApi in-process, without HTTP. Game time limits from cgk_config are
+kept, they cost no wall time. Runs are repeatable for a given --seed.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, asdict
+
+from src.app.store.scheduler.clock import VirtualClock
+from src.app.web.app import Application
+from src.app.web.config import BotMode
+from src.tools.load_generator import LoadGenerator, LoadResult
+
+# rate limits are measured in wall time, so they are lifted
+UNLIMITED_RATE = 10 ** 9
+
+
+@dataclass
+class SimulationResult(LoadResult):
+    simulated_time: float = 0.0
+
+
+class GameSimulator(LoadGenerator):
+    def __init__(self, *args, start_time: float = 1_700_000_000, **kwargs):
+        kwargs.setdefault("time_limit", None)
+        super().__init__(*args, **kwargs)
+        self.virtual_clock = VirtualClock(start=start_time)
+        self.clock = self.virtual_clock.time
+        self.fake.clock = self.virtual_clock.time
+        self.incoming: list[dict] = []
+        self.simulated_time = 0.0
+
+    def push_update(self, raw_update: dict) -> None:
+        self.incoming.append(raw_update)
+
+    def setup(self) -> Application:
+        app = super().setup()
+        bot = app.config.bot
+        # updates are fed like a webhook, no poller is started
+        bot.mode = BotMode.WEBHOOK
+        bot.webhook_url = "http://simulator/bot.webhook"
+        bot.global_rate_limit = bot.global_burst = UNLIMITED_RATE
+        bot.chat_rate_limit = bot.chat_burst = UNLIMITED_RATE
+        app.store.scheduler.clock = self.virtual_clock
+        app.store.tg_api.call = self.fake.call
+        return app
+
+    def new_result(self) -> SimulationResult:
+        return SimulationResult(**asdict(super().new_result()))
+
+    def busy(self, app: Application) -> bool:
+        next_at = app.store.scheduler.next_at()
+        return bool(
+            self.incoming
+            or app.store.tg_api.dispatcher.stats.pending
+            or not app.store.tg_api.sender.idle
+            or any(chat.inbox.qsize() for chat in self.simulated.values())
+            or (next_at is not None and next_at <= self.virtual_clock.time())
+        )
+
+    async def settle(self, app: Application) -> None:
+        """
+        Run until every update, deadline due and outbound call is handled
+        and simulated players have reacted
+        """
+        while self.busy(app):
+            while self.incoming:
+                await app.store.tg_api.handle_raw_update(self.incoming.pop(0))
+            await asyncio.sleep(0)
+
+    async def play(self, app: Application, timeout: float) -> tuple[set, set]:
+        started_at = self.virtual_clock.time()
+        tasks = [
+            asyncio.create_task(chat.play(self.games))
+            for chat in self.simulated.values()
+        ]
+
+        async def drive():
+            while True:
+                await self.settle(app)
+                if all(task.done() for task in tasks):
+                    return
+                next_at = app.store.scheduler.next_at()
+                if next_at is None:
+                    # nothing scheduled and nobody to reply, games are stuck
+                    return
+                self.virtual_clock.advance_to(next_at)
+
+        try:
+            await asyncio.wait_for(drive(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.simulated_time = self.virtual_clock.time() - started_at
+        done = {task for task in tasks if task.done()}
+        return done, set(tasks) - done
+
+    async def run(self, timeout: float) -> SimulationResult:
+        result = await super().run(timeout)
+        result.simulated_time = self.simulated_time
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--config", default="src/env/dev.env.yaml")
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--players", type=int, default=3, help="Team size, 1 to 6")
+    parser.add_argument("--games", type=int, default=1, help="Games per chat")
+    parser.add_argument(
+        "--accuracy", type=float, default=0.5, help="Share of correct answers"
+    )
+    parser.add_argument(
+        "--late-rate", type=float, default=0.1,
+        help="Share of capitan picks and answers never sent",
+    )
+    parser.add_argument("--timeout", type=float, default=600, help="Wall time limit, sec")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Save results to JSON file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    simulator = GameSimulator(
+        args.config,
+        chats=args.chats,
+        players=args.players,
+        games=args.games,
+        accuracy=args.accuracy,
+        late_rate=args.late_rate,
+    )
+    result = asdict(asyncio.run(simulator.run(args.timeout)))
+    result["started_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
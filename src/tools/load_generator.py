@@ -0,0 +1,375 @@
+"""
+Load generator and throughput benchmark for the bot pipeline.
+
+Usage:
+    python -m src.tools.load_generator --config src/env/dev.env.yaml \
+        --chats 100 --games 1 --output load.json
+
+Runs the real application (database, BotManager, accessors, dispatcher,
+sender) against FakeTgApi. Every simulated group chat plays full games:
+/team_up, join callbacks, /start_game, then the capitan picks a responder
+and the responder answers every question. Game time limits are shortened
+by --time-limit. Needs the database from config, questions are taken
+from it.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from aiohttp import web
+from sqlalchemy import event
+
+from src.app.bot.manager import cgk_config
+from src.app.web.app import setup_app, Application
+from src.app.web.config import BotMode
+from src.tools.fake_tg_api import FakeTgApi
+
+CHAT_ID_BASE = -1_000_000
+PLAYER_ID_BASE = 1_000_000
+
+
+@dataclass
+class LoadResult:
+    chats: int
+    players: int
+    games_per_chat: int
+    time_limit: float
+    elapsed: float = 0.0
+    updates: int = 0
+    updates_per_sec: float = 0.0
+    latency_ms: dict = field(default_factory=dict)
+    db_queries: int = 0
+    db_queries_per_update: float = 0.0
+    api_calls: int = 0
+    api_calls_per_game: float = 0.0
+    games_finished: int = 0
+    games_timed_out: int = 0
+    dispatcher: dict = field(default_factory=dict)
+    update_filter: dict = field(default_factory=dict)
+
+
+def percentiles(values: list[float]) -> dict:
+    """
+    p50/p95/p99 and max of values, in milliseconds
+    :param values: Latencies in seconds
+    :return: Dict with percentiles
+    """
+    if not values:
+        return {}
+    if len(values) == 1:
+        values = values * 2
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "max": max(values) * 1000,
+    }
+
+
+class SimulatedChat:
+    """
+    Group chat with a team of players, reacting to bot messages
+    """
+
+    def __init__(self, generator: "LoadGenerator", index: int):
+        self.generator = generator
+        self.chat_id = CHAT_ID_BASE - index
+        self.players = [
+            {
+                "id": PLAYER_ID_BASE + index * generator.players + i,
+                "is_bot": False,
+                "first_name": f"Player{i}",
+            }
+            for i in range(generator.players)
+        ]
+        self.by_name = {player["first_name"]: player for player in self.players}
+        self.inbox: asyncio.Queue[str] = asyncio.Queue()
+        self.join_message: Optional[dict] = None
+        self.question = ""
+
+    def chat(self) -> dict:
+        return {"id": self.chat_id, "type": "group", "title": f"load {self.chat_id}"}
+
+    def send(self, player: dict, text: str) -> None:
+        self.generator.push_update({
+            "message": {
+                "message_id": next(self.generator.message_ids),
+                "date": int(self.generator.clock()),
+                "text": text,
+                "chat": self.chat(),
+                "from": player,
+            }
+        })
+
+    def press(self, player: dict, data: str) -> None:
+        self.generator.push_update({
+            "callback_query": {
+                "id": str(next(self.generator.message_ids)),
+                "data": data,
+                "from": player,
+                "message": self.join_message,
+            }
+        })
+
+    async def wait_for(self, *texts: str) -> str:
+        """
+        Skip bot messages until one containing any of texts
+        :return: Bot message text
+        """
+        while True:
+            text = await self.inbox.get()
+            if any(part in text for part in texts):
+                return text
+
+    async def play(self, games: int) -> int:
+        finished = 0
+        for _ in range(games):
+            if await self.play_game():
+                finished += 1
+        return finished
+
+    async def play_game(self) -> bool:
+        host = self.players[0]
+        self.send(host, "/team_up")
+        await self.wait_for("Press the button to join")
+        self.join_message = {
+            "message_id": next(self.generator.message_ids),
+            "date": int(self.generator.clock()),
+            "text": "Press the button to join THE TEAM",
+            "chat": self.chat(),
+            "from": {"id": 1, "is_bot": True, "first_name": "cgkhost"},
+        }
+        for player in self.players:
+            self.press(player, "join")
+        for _ in self.players:
+            await self.wait_for("joined the team!")
+        self.send(host, "/start_game")
+
+        capitan = None
+        while True:
+            text = await self.wait_for(
+                "is the capitan!", "You have", "Cap, who will answer?",
+                "send your answer in", "Host won.", "Team won.", "No questions to ask",
+            )
+            if "is the capitan!" in text:
+                capitan = self.by_name[text.split(" is the capitan!")[0]]
+            elif "You have" in text:
+                self.question = text.rsplit("\nYou have", 1)[0]
+            elif "Cap, who will answer?" in text:
+                # a late player never replies and the round times out
+                if random.random() >= self.generator.late_rate:
+                    self.send(capitan, random.choice(self.players)["first_name"])
+            elif "send your answer in" in text:
+                responder = self.by_name[text.split(", send your answer in")[0]]
+                if random.random() >= self.generator.late_rate:
+                    self.send(responder, self.generator.answer_for(self.question))
+            else:
+                return "No questions to ask" not in text
+
+
+class LoadGenerator:
+    def __init__(
+            self,
+            config_path: str,
+            chats: int,
+            players: int = 3,
+            games: int = 1,
+            time_limit: Optional[float] = 0.1,
+            accuracy: float = 0.5,
+            late_rate: float = 0.0,
+            chat_rate_limit: Optional[float] = None,
+    ):
+        self.config_path = config_path
+        self.chats = chats
+        self.players = players
+        self.games = games
+        self.time_limit = time_limit
+        self.accuracy = accuracy
+        self.late_rate = late_rate
+        self.chat_rate_limit = chat_rate_limit
+        self.fake = FakeTgApi(first_update_id=int(time.time() * 1000))
+        self.message_ids = itertools.count(1)
+        self.answers: dict[str, str] = {}
+        self.latencies: list[float] = []
+        self.db_queries = 0
+        self.simulated: dict[int, SimulatedChat] = {}
+        self.clock = time.time
+
+    def push_update(self, raw_update: dict) -> None:
+        self.fake.push_update(raw_update)
+
+    def answer_for(self, question: str) -> str:
+        answer = self.answers.get(question, "")
+        return answer if random.random() < self.accuracy else f"not {answer}"
+
+    def setup(self) -> Application:
+        app = setup_app(self.config_path)
+        app.config.bot.api_url = self.fake.url
+        app.config.bot.token = self.fake.token
+        app.config.bot.mode = BotMode.POLLING
+        if self.chat_rate_limit is not None:
+            app.config.bot.chat_rate_limit = self.chat_rate_limit
+            app.config.bot.chat_burst = max(app.config.bot.chat_burst, self.chat_rate_limit)
+        if self.time_limit is not None:
+            cgk_config.TIME_LIMIT_DISC_MAIN = self.time_limit
+            cgk_config.TIME_LIMIT_DISC_EXTRA = self.time_limit
+            cgk_config.TIME_LIMIT_CAPITAN = self.time_limit * 10
+            cgk_config.TIME_LIMIT_ANSWER = self.time_limit * 10
+
+        # time every handle_update call made by the dispatcher
+        handle_update = app.store.bot_manager.handle_update
+
+        async def timed_handle_update(update):
+            started = time.perf_counter()
+            try:
+                await handle_update(update)
+            finally:
+                self.latencies.append(time.perf_counter() - started)
+
+        app.store.bot_manager.handle_update = timed_handle_update
+
+        # every bot message is delivered to the simulated chat
+        send_message = self.fake.methods["sendMessage"]
+
+        async def observed_send_message(params: dict) -> dict:
+            result = await send_message(params)
+            chat = self.simulated.get(result["chat"]["id"])
+            if chat is not None:
+                chat.inbox.put_nowait(result["text"] or "")
+            return result
+
+        self.fake.methods["sendMessage"] = observed_send_message
+        return app
+
+    def count_query(self, *_):
+        self.db_queries += 1
+
+    def new_result(self) -> LoadResult:
+        return LoadResult(
+            chats=self.chats,
+            players=self.players,
+            games_per_chat=self.games,
+            time_limit=self.time_limit,
+        )
+
+    async def play(self, app: Application, timeout: float) -> tuple[set, set]:
+        """
+        Play games in all chats
+        :param app: Running application
+        :param timeout: Seconds to wait for games to finish
+        :return: Done and pending play tasks
+        """
+        tasks = [
+            asyncio.create_task(chat.play(self.games))
+            for chat in self.simulated.values()
+        ]
+        return await asyncio.wait(tasks, timeout=timeout)
+
+    async def run(self, timeout: float) -> LoadResult:
+        await self.fake.start()
+        app = self.setup()
+        runner = web.AppRunner(app)
+        await runner.setup()
+        engine = app.database._engine.sync_engine
+        event.listen(engine, "before_cursor_execute", self.count_query)
+        result = self.new_result()
+        try:
+            self.answers = {
+                question.title: question.answer
+                for question in await app.store.quiz.list_questions()
+            }
+            self.simulated = {
+                chat.chat_id: chat
+                for chat in (SimulatedChat(self, i) for i in range(self.chats))
+            }
+            self.latencies.clear()
+            self.db_queries = 0
+            self.fake.calls.clear()
+
+            started = time.perf_counter()
+            done, pending = await self.play(app, timeout)
+            result.elapsed = time.perf_counter() - started
+            for task in pending:
+                task.cancel()
+            result.games_finished = sum(task.result() for task in done)
+            result.games_timed_out = len(pending)
+            result.dispatcher = app.store.tg_api.dispatcher.get_stats()
+            result.update_filter = app.store.bot_manager.update_filter.get_stats()
+        finally:
+            event.remove(engine, "before_cursor_execute", self.count_query)
+            await runner.cleanup()
+            await self.fake.stop()
+
+        calls_per_chat = defaultdict(int)
+        for call in self.fake.calls:
+            if "chat_id" in call.params:
+                calls_per_chat[int(call.params["chat_id"])] += 1
+        # answerCallbackQuery has no chat_id but belongs to the chat games
+        result.api_calls = sum(calls_per_chat.values()) + len(
+            self.fake.calls_of("answerCallbackQuery")
+        )
+        result.updates = len(self.latencies)
+        result.updates_per_sec = result.updates / result.elapsed if result.elapsed else 0.0
+        result.latency_ms = percentiles(self.latencies)
+        result.db_queries = self.db_queries
+        result.db_queries_per_update = self.db_queries / result.updates if result.updates else 0.0
+        games_played = result.games_finished or 1
+        result.api_calls_per_game = result.api_calls / games_played
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--config", default="src/env/dev.env.yaml")
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--players", type=int, default=3, help="Team size, 1 to 6")
+    parser.add_argument("--games", type=int, default=1, help="Games per chat")
+    parser.add_argument(
+        "--time-limit", type=float, default=0.1, help="Discussion time limit, sec"
+    )
+    parser.add_argument(
+        "--accuracy", type=float, default=0.5, help="Share of correct answers"
+    )
+    parser.add_argument(
+        "--late-rate", type=float, default=0.0,
+        help="Share of capitan picks and answers never sent",
+    )
+    parser.add_argument(
+        "--chat-rate-limit", type=float, default=None,
+        help="Override bot.chat_rate_limit, messages per sec",
+    )
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Save results to JSON file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    generator = LoadGenerator(
+        args.config,
+        chats=args.chats,
+        players=args.players,
+        games=args.games,
+        time_limit=args.time_limit,
+        accuracy=args.accuracy,
+        late_rate=args.late_rate,
+        chat_rate_limit=args.chat_rate_limit,
+    )
+    result = asdict(asyncio.run(generator.run(args.timeout)))
+    result["started_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Replay recorded getUpdates traffic through the bot for regression runs.
+
+Usage:
+    python -m src.tools.replay_updates updates.jsonl.gz \
+        --config src/env/dev.env.yaml --speed 1 --output replay.json
+
+Captures are written by the bot when `bot.record_updates` is set. Updates
+go through `TgApiAccessor.dict_to_dc` and `BotManager.handle_update`,
+in order inside a chat and concurrently across chats. --speed 1 keeps the
+original timing, --speed N replays N times faster, --speed 0 as fast as
+possible. Bot API calls go to FakeTgApi in-process, so nothing is sent to
+the recorded chats. Reports handle latency and DB queries per update.
+"""
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from aiohttp import web
+from sqlalchemy import event
+
+from src.app.store.tg_api.dataclasses import Update
+from src.app.store.tg_api.dispatcher import UpdateDispatcher
+from src.app.store.tg_api.recorder import read_capture
+from src.app.web.app import setup_app, Application
+from src.app.web.config import BotMode
+from src.tools.fake_tg_api import FakeTgApi
+from src.tools.load_generator import percentiles
+
+
+@dataclass
+class ReplayResult:
+    capture: str
+    speed: float
+    batches: int = 0
+    updates: int = 0
+    skipped: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    updates_per_sec: float = 0.0
+    latency_ms: dict = field(default_factory=dict)
+    db_queries: int = 0
+    db_queries_per_update: float = 0.0
+    api_calls: int = 0
+
+
+class UpdateReplayer:
+    def __init__(self, config_path: str, capture: str, speed: float = 1.0):
+        self.config_path = config_path
+        self.capture = capture
+        self.speed = speed
+        self.fake = FakeTgApi()
+        self.latencies: list[float] = []
+        self.db_queries = 0
+        self.result = ReplayResult(capture=capture, speed=speed)
+
+    def setup(self) -> Application:
+        app = setup_app(self.config_path)
+        bot = app.config.bot
+        # updates are fed by the replay, no poller or recorder
+        bot.mode = BotMode.WEBHOOK
+        bot.webhook_url = "http://replay/bot.webhook"
+        bot.record_updates = None
+        app.store.tg_api.call = self.fake.call
+        return app
+
+    def count_query(self, *_):
+        self.db_queries += 1
+
+    async def handle(
+            self, app: Application, previous: Optional[asyncio.Task], update: Update
+    ) -> None:
+        # updates of a chat are handled one after another
+        if previous is not None:
+            await previous
+        started = time.perf_counter()
+        try:
+            await app.store.bot_manager.handle_update(update)
+        except Exception:
+            self.result.failed += 1
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    async def replay(self, app: Application) -> None:
+        loop = asyncio.get_running_loop()
+        tg_api = app.store.tg_api
+        chains: dict[int, asyncio.Task] = {}
+        first_time = None
+        started = loop.time()
+        for received, raw_updates in read_capture(self.capture):
+            self.result.batches += 1
+            if self.speed:
+                if first_time is None:
+                    first_time = received
+                delay = (received - first_time) / self.speed - (loop.time() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            for raw_update in raw_updates:
+                update = tg_api.dict_to_dc(raw_update) if tg_api.accepts(raw_update) else None
+                if update is None:
+                    self.result.skipped += 1
+                    continue
+                chat_id = UpdateDispatcher.get_chat_id(update)
+                chains[chat_id] = asyncio.create_task(
+                    self.handle(app, chains.get(chat_id), update)
+                )
+        await asyncio.gather(*chains.values())
+
+    async def run(self) -> ReplayResult:
+        app = self.setup()
+        runner = web.AppRunner(app)
+        await runner.setup()
+        engine = app.database._engine.sync_engine
+        event.listen(engine, "before_cursor_execute", self.count_query)
+        try:
+            self.fake.calls.clear()
+            started = time.perf_counter()
+            await self.replay(app)
+            self.result.elapsed = time.perf_counter() - started
+        finally:
+            event.remove(engine, "before_cursor_execute", self.count_query)
+            await runner.cleanup()
+
+        result = self.result
+        result.updates = len(self.latencies)
+        result.updates_per_sec = result.updates / result.elapsed if result.elapsed else 0.0
+        result.latency_ms = percentiles(self.latencies)
+        result.db_queries = self.db_queries
+        result.db_queries_per_update = self.db_queries / result.updates if result.updates else 0.0
+        result.api_calls = len(self.fake.calls)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("capture", help="gzip JSONL file written by bot.record_updates")
+    parser.add_argument("--config", default="src/env/dev.env.yaml")
+    parser.add_argument(
+        "--speed", type=float, default=1.0,
+        help="Replay speed factor, 0 to replay as fast as possible",
+    )
+    parser.add_argument("--output", default=None, help="Save results to JSON file")
+    args = parser.parse_args()
+
+    result = asdict(asyncio.run(UpdateReplayer(args.config, args.capture, args.speed).run()))
+    result["started_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+POST recorded Telegram updates to a running bot in webhook mode.
+
+Usage:
+    python -m src.tools.webhook_harness updates.jsonl \
+        --url http://localhost:8080/bot.webhook --secret <webhook_secret>
+
+The file holds one raw update per line, as received from getUpdates or a
+webhook. Games are kept in the memory of the bot process, so the url must
+point at the single bot process, not at a load balancer over several.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from aiohttp import ClientSession
+
+from src.app.bot.views import SECRET_TOKEN_HEADER
+
+
+def read_updates(path: str) -> list[dict]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def post_updates(
+        url: str, secret: str, updates: list[dict], concurrency: int = 1
+) -> dict:
+    """
+    Send updates to webhook url
+    :param url: Webhook url
+    :param secret: Secret token, sent in the header Telegram uses
+    :param updates: Raw updates
+    :param concurrency: Number of requests in flight
+    :return: Count of responses per HTTP status and elapsed time
+    """
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {SECRET_TOKEN_HEADER: secret}
+
+    async def post(session: ClientSession, update: dict):
+        async with semaphore:
+            async with session.post(url, json=update, headers=headers) as response:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        if concurrency == 1:
+            # keep recorded order
+            for update in updates:
+                await post(session, update)
+        else:
+            await asyncio.gather(*(post(session, update) for update in updates))
+    return {"statuses": statuses, "elapsed": time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="JSONL file with recorded updates")
+    parser.add_argument("--url", default="http://localhost:8080/bot.webhook")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    result = asyncio.run(
+        post_updates(args.url, args.secret, read_updates(args.path), args.concurrency)
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()